@@ -1,10 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.paginator import Paginator
+from django.conf import settings
 from .models import CustomUser, UserProfile, AIAgentConfig
+from . import graph
+from .feed import feed_cache_stats
+from .report_cache import snapshot_cache
+import os
+import time
 
 # Check if user is superuser
 def is_superuser(user):
@@ -261,3 +268,57 @@ def admin_subscription_list(request):
         'query': query,
     }
     return render(request, 'custom_admin/subscription_list.html', context)
+
+
+@login_required
+@user_passes_test(is_superuser)
+def admin_cache_stats(request):
+    """
+    Cache and Graph API counters of the worker serving this request, for tuning TTLs.
+    """
+    return JsonResponse({
+        'pid': os.getpid(),
+        'feed_cache': feed_cache_stats.as_dict(),
+        'report_cache': snapshot_cache.stats(),
+        'graph_api': graph.client.stats(),
+        'graph_usage': graph.client.usage(),
+    })
+
+
+@login_required
+@user_passes_test(is_superuser)
+def admin_graph_usage(request):
+    """
+    Facebook rate limit usage of the app and of each page, as last reported by Graph.
+    """
+    threshold = settings.GRAPH_USAGE_THROTTLE
+    entries = graph.cached_usage()
+    page_ids = [entry['scope'].split(':', 1)[1] for entry in entries if entry['scope'].startswith('page:')]
+    owners = dict(
+        AIAgentConfig.objects.filter(facebook_page_id__in=page_ids).values_list('facebook_page_id', 'user__email')
+    )
+
+    now = time.time()
+    app_usage = None
+    page_usage = []
+    for entry in entries:
+        entry = dict(entry)
+        entry['age'] = int(now - entry['updated_at'])
+        entry['regain_in'] = int(entry['regain_at'] - now) if entry['regain_at'] and entry['regain_at'] > now else 0
+        entry['level'] = 'limit' if entry['percent'] >= 100 else 'high' if entry['percent'] >= threshold else 'ok'
+        if entry['scope'] == 'app':
+            app_usage = entry
+        else:
+            entry['page_id'] = entry['scope'].split(':', 1)[1]
+            entry['owner'] = owners.get(entry['page_id'], '')
+            page_usage.append(entry)
+    page_usage.sort(key=lambda entry: entry['percent'], reverse=True)
+
+    context = {
+        'app_usage': app_usage,
+        'page_usage': page_usage,
+        'threshold': threshold,
+        'usage_shared': graph.usage_is_shared(),
+        'endpoints': graph.client.stats(),
+    }
+    return render(request, 'custom_admin/graph_usage.html', context)
@@ -1,7 +1,18 @@
-from django.http import HttpResponse, JsonResponse
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from .models import CustomUser, AIAgentConfig, UserProfile
+from . import blocked_posts, config_snapshots
+
+MAX_BULK_PREFIXES = 500
+STREAM_CHUNK = 500  # blocked post IDs per streamed chunk
+API_FIELDS = ('fb_page_id', 'system_prompt', 'webhook_url', 'fb_page_api', 'ai_agent_status', 'block_post_ids', 'all')
 
 
 @csrf_exempt
@@ -17,7 +28,7 @@ def api_get_user_config(request, admin_password, email_prefix, field):
     - webhook_url: Returns webhook URL
     - ai_agent_status: Returns whether AI agent is on or off
     - block_post_ids: Returns list of blocked Facebook post IDs
-    - all: Returns all configuration as JSON
+    - all: Returns all configuration as JSON (?fields=a,b for a subset)
     """
     
     # Verify admin password
@@ -25,75 +36,206 @@ def api_get_user_config(request, admin_password, email_prefix, field):
         return HttpResponse('Unauthorized', status=401)
     
     try:
-        # Find user by email prefix
-        user = CustomUser.objects.filter(email__startswith=email_prefix + '@').first()
+        # Served from the precomputed snapshot; the database is only read on a cache miss
+        snapshot = config_snapshots.get_snapshot(email_prefix)
         
-        if not user:
-            # Try exact match if no @ symbol
-            users = CustomUser.objects.filter(email__icontains=email_prefix)
-            if users.exists():
-                user = users.first()
-            else:
-                return HttpResponse('User not found', status=404)
-        
-        # Get AI config
-        try:
-            ai_config = user.ai_config
-        except AIAgentConfig.DoesNotExist:
+        if snapshot.get('missing') == config_snapshots.NOT_FOUND:
+            return HttpResponse('User not found', status=404)
+        if snapshot.get('missing') == config_snapshots.NO_CONFIG:
             return HttpResponse('AI configuration not found for this user', status=404)
         
         # Check subscription status — if expired, agent is effectively off
-        try:
-            profile = user.profile
-            subscription_active = profile.is_subscription_active()
-        except UserProfile.DoesNotExist:
-            subscription_active = False
-        
-        effective_active = ai_config.is_active and subscription_active
-        
-        # Return requested field
-        if field == 'fb_page_id':
-            return HttpResponse(ai_config.facebook_page_id or '', content_type='text/plain')
-        
-        elif field == 'system_prompt':
-            return HttpResponse(ai_config.system_prompt or '', content_type='text/plain')
-        
-        elif field == 'webhook_url':
-            return HttpResponse(ai_config.get_webhook_url(), content_type='text/plain')
-        
-        elif field == 'fb_page_api':
-            return HttpResponse(ai_config.facebook_page_api or '', content_type='text/plain')
-        
-        elif field == 'ai_agent_status':
-            status = 'on' if effective_active else 'off'
-            return JsonResponse({'status': status})
-        
-        elif field == 'block_post_ids':
-            # User said: "i will get all the list of block FB post ids"
-            blocked_ids = ai_config.get_blocked_post_ids_list()
-            return JsonResponse({'blocked_post_ids': blocked_ids})
-        
-        elif field == 'all':
-            blocked_ids = ai_config.get_blocked_post_ids_list()
-            data = {
-                'email': user.email,
-                'email_prefix': user.get_email_prefix(),
-                'ai_agent_status': 'on' if effective_active else 'off',
-                'is_active': effective_active,
-                'subscription_active': subscription_active,
-                'fb_page_id': ai_config.facebook_page_id or '',
-                'fb_page_api': ai_config.facebook_page_api or '',
-                'system_prompt': ai_config.system_prompt or '',
-                'webhook_url': ai_config.get_webhook_url(),
-                'blocked_post_ids': blocked_ids,
-            }
-            return JsonResponse(data)
-        
-        else:
+        config = config_snapshots.resolve(snapshot)
+        if field not in API_FIELDS:
             return HttpResponse(
                 'Invalid field. Available fields: fb_page_id, fb_page_api, system_prompt, webhook_url, ai_agent_status, block_post_ids, all',
                 status=400
             )
+        
+        # Clients that send back the ETag get a 304 until the config changes
+        tag = config_snapshots.etag(config) if config['config_version'] is not None else None
+        if tag and {tag, '*'} & set(parse_etags(request.headers.get('If-None-Match', ''))):
+            response = HttpResponseNotModified()
+            response['ETag'] = tag
+            return response
+        
+        response = _field_response(request, config, field)
+        if tag and response.status_code == 200:
+            response['ETag'] = tag
+        return response
     
     except Exception as e:
         return HttpResponse(f'Error: {str(e)}', status=500)
+
+
+@csrf_exempt
+async def api_user_config_changes(request, admin_password, email_prefix):
+    """
+    Long-poll endpoint that waits for a user's configuration to change
+    URL: /api/user/{admin_password}/{email_prefix}/changes/?since={version}&timeout={seconds}
+    
+    Answers as soon as the config version is above `since`, with the new
+    version and the full configuration, or after `timeout` seconds (default
+    30, at most CONFIG_CHANGES_MAX_WAIT) with {"changed": false}.
+    """
+    if admin_password != settings.API_ADMIN_PASSWORD:
+        return HttpResponse('Unauthorized', status=401)
+    try:
+        since = int(request.GET.get('since', -1))
+        timeout = min(float(request.GET.get('timeout', 30)), settings.CONFIG_CHANGES_MAX_WAIT)
+    except ValueError:
+        return HttpResponse('since and timeout must be numbers', status=400)
+    
+    deadline = time.monotonic() + max(0.0, timeout)
+    versions = config_snapshots.versions(email_prefix)
+    while True:
+        # The database, not the cache, since a snapshot may lag behind in this worker
+        version = await versions.afirst()
+        if version is None:
+            return HttpResponse('AI configuration not found for this user', status=404)
+        if version > since:
+            config = config_snapshots.resolve(await sync_to_async(config_snapshots.rebuild)(email_prefix))
+            response = JsonResponse({'changed': True, 'version': config['config_version'], 'config': config})
+            response['ETag'] = config_snapshots.etag(config)
+            return response
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return JsonResponse({'changed': False, 'version': version})
+        await asyncio.sleep(min(settings.CONFIG_CHANGES_POLL_INTERVAL, remaining))
+
+
+def _blocked_posts_config(config_ids):
+    """(config id, None) for a blocked_posts.config_ids() result, or (None, 404 response)"""
+    if not config_ids:
+        return None, JsonResponse({'error': 'User not found'}, status=404)
+    if config_ids[0] is None:
+        return None, JsonResponse({'error': 'AI configuration not found for this user'}, status=404)
+    return config_ids[0], None
+
+
+@csrf_exempt
+def api_user_blocked_post(request, admin_password, email_prefix, post_id):
+    """
+    Public API endpoint telling whether one Facebook post is blocked for a user
+    URL: /api/user/{admin_password}/{email_prefix}/blocked/{post_id}/
+    
+    Returns {"post_id": "...", "blocked": true|false} from a single index lookup.
+    """
+    if admin_password != settings.API_ADMIN_PASSWORD:
+        return HttpResponse('Unauthorized', status=401)
+    config_id, error = _blocked_posts_config(list(blocked_posts.config_ids(email_prefix)))
+    if error:
+        return error
+    return JsonResponse({'post_id': post_id, 'blocked': blocked_posts.is_blocked(config_id, post_id)})
+
+
+async def _stream_blocked_post_ids(post_ids):
+    yield '{"blocked_post_ids": ['
+    chunk = []
+    first = True
+    async for post_id in post_ids.aiterator(chunk_size=2000):
+        chunk.append(json.dumps(post_id))
+        if len(chunk) >= STREAM_CHUNK:
+            yield ('' if first else ',') + ','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']}'
+
+
+@csrf_exempt
+async def api_user_blocked_posts(request, admin_password, email_prefix):
+    """
+    Public API endpoint streaming every blocked Facebook post ID of a user
+    URL: /api/user/{admin_password}/{email_prefix}/blocked/
+    
+    Returns {"blocked_post_ids": [...]}, written out in chunks so long lists
+    are never built in memory.
+    """
+    if admin_password != settings.API_ADMIN_PASSWORD:
+        return HttpResponse('Unauthorized', status=401)
+    config_id, error = _blocked_posts_config([pk async for pk in blocked_posts.config_ids(email_prefix)])
+    if error:
+        return error
+    post_ids = blocked_posts.post_ids(config_id)
+    return StreamingHttpResponse(_stream_blocked_post_ids(post_ids), content_type='application/json')
+
+
+def _field_response(request, config, field):
+    """Response for one field of a resolved config"""
+    if field in ('fb_page_id', 'system_prompt', 'webhook_url', 'fb_page_api'):
+        return HttpResponse(config[field], content_type='text/plain')
+    
+    elif field == 'ai_agent_status':
+        return JsonResponse({'status': config['ai_agent_status']})
+    
+    elif field == 'block_post_ids':
+        # User said: "i will get all the list of block FB post ids"
+        return JsonResponse({'blocked_post_ids': config['blocked_post_ids']})
+    
+    # 'all': ?fields=fb_page_id,ai_agent_status returns just those keys
+    requested = [name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in config_snapshots.FIELDS]
+    if unknown:
+        return HttpResponse(
+            f"Invalid fields: {', '.join(unknown)}. Available: {', '.join(config_snapshots.FIELDS)}",
+            status=400
+        )
+    if requested:
+        config = {name: config[name] for name in requested}
+    return JsonResponse(config)
+
+
+def _split(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value or [] if str(item).strip()]
+
+
+@csrf_exempt
+def api_get_user_configs(request, admin_password):
+    """
+    Public API endpoint returning the configuration of many users at once
+    URL: /api/users/{admin_password}/configs/
+
+    POST a JSON body {"prefixes": ["alice", "bob"], "fields": ["fb_page_id", "ai_agent_status"]},
+    or GET ?prefixes=alice,bob&fields=fb_page_id,ai_agent_status. Fields are
+    those of the 'all' response and default to all of them.
+
+    Returns {"configs": {prefix: {...}}, "errors": {prefix: "User not found"}}
+    """
+    if admin_password != settings.API_ADMIN_PASSWORD:
+        return HttpResponse('Unauthorized', status=401)
+
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    else:
+        payload = request.GET
+
+    prefixes = list(dict.fromkeys(_split(payload.get('prefixes'))))
+    fields = _split(payload.get('fields')) or list(config_snapshots.FIELDS)
+    if not prefixes:
+        return JsonResponse({'error': 'No prefixes given'}, status=400)
+    if len(prefixes) > MAX_BULK_PREFIXES:
+        return JsonResponse({'error': f'At most {MAX_BULK_PREFIXES} prefixes per request'}, status=400)
+    unknown = [name for name in fields if name not in config_snapshots.FIELDS]
+    if unknown:
+        return JsonResponse({'error': f"Invalid fields: {', '.join(unknown)}", 'available': config_snapshots.FIELDS}, status=400)
+
+    configs = {}
+    errors = {}
+    for prefix, snapshot in config_snapshots.get_snapshots(prefixes).items():
+        if snapshot.get('missing') == config_snapshots.NOT_FOUND:
+            errors[prefix] = 'User not found'
+        elif snapshot.get('missing') == config_snapshots.NO_CONFIG:
+            errors[prefix] = 'AI configuration not found for this user'
+        else:
+            config = config_snapshots.resolve(snapshot)
+            configs[prefix] = {name: config[name] for name in fields}
+    return JsonResponse({'configs': configs, 'errors': errors})
@@ -0,0 +1,49 @@
+"""
+Blocked Facebook posts, one BlockedPost row per post.
+
+Users still edit blocked_post_ids as a newline-separated text field. The
+post_save handler in signals.py mirrors every edit into BlockedPost rows, so
+"is this post blocked" is one lookup on the (config, post_id) unique index
+instead of splitting the text and searching the list.
+"""
+from django.db.models import Q
+
+from .models import BlockedPost, CustomUser
+
+DELETE_CHUNK = 500
+CREATE_BATCH = 1000
+
+
+def sync(config):
+    """Make the config's BlockedPost rows match its blocked_post_ids text."""
+    wanted = list(dict.fromkeys(config.get_blocked_post_ids_list()))
+    existing = set(config.blocked_posts.values_list('post_id', flat=True))
+
+    removed = list(existing.difference(wanted))
+    for start in range(0, len(removed), DELETE_CHUNK):
+        config.blocked_posts.filter(post_id__in=removed[start:start + DELETE_CHUNK]).delete()
+
+    added = [post_id for post_id in wanted if post_id not in existing]
+    BlockedPost.objects.bulk_create(
+        [BlockedPost(config=config, post_id=post_id) for post_id in added],
+        batch_size=CREATE_BATCH, ignore_conflicts=True,
+    )
+
+
+def config_ids(email_prefix):
+    """
+    Query for the AIAgentConfig id of the user an API email prefix refers to.
+    It is empty when no user matches, and holds None when the user has no config.
+    """
+    match = Q(email_prefix=email_prefix)
+    if '@' in email_prefix:
+        match |= Q(email=email_prefix)
+    return CustomUser.objects.filter(match).order_by('pk').values_list('ai_config__id', flat=True)[:1]
+
+
+def post_ids(config_id):
+    return BlockedPost.objects.filter(config_id=config_id).order_by('pk').values_list('post_id', flat=True)
+
+
+def is_blocked(config_id, post_id):
+    return BlockedPost.objects.filter(config_id=config_id, post_id=post_id).exists()
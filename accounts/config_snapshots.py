@@ -0,0 +1,163 @@
+"""
+Precomputed per-user config served by api_get_user_config.
+
+The n8n workflow asks for a user's config on every incoming Facebook comment.
+Instead of looking the user up and loading their AIAgentConfig and
+UserProfile each time, the whole config is built once into a snapshot and
+kept under config-snapshot:<email prefix> in the "snapshots" cache, which is
+never the database (see CACHES in settings). signals.py rebuilds it whenever
+the user, their AIAgentConfig or their UserProfile is saved, so the API
+answers from the cache without touching the database.
+
+The subscription can run out without any save, so the snapshot keeps the
+expiry date and the effective on/off status is worked out when it is served.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from .models import AIAgentConfig, CustomUser, UserProfile
+
+SNAPSHOT_KEY = 'config-snapshot:{prefix}'
+NOT_FOUND = 'user'  # snapshot['missing'] when no user matches the prefix
+NO_CONFIG = 'config'  # ... when the user has no AIAgentConfig
+
+# Fields a caller may ask for, in the order the 'all' response lists them
+FIELDS = (
+    'email', 'email_prefix', 'ai_agent_status', 'is_active', 'subscription_active',
+    'fb_page_id', 'fb_page_api', 'system_prompt', 'webhook_url', 'blocked_post_ids', 'config_version',
+)
+
+
+def _cache():
+    return caches['snapshots']
+
+
+def _key(prefix):
+    return SNAPSHOT_KEY.format(prefix=prefix)
+
+
+def find_user(email_prefix):
+    """The user an API email prefix refers to, with their config and profile loaded."""
+    users = CustomUser.objects.select_related('ai_config', 'profile')
+    user = users.filter(email_prefix=email_prefix).first()
+    if not user and '@' in email_prefix:
+        # Try exact match if a whole email was given
+        user = users.filter(email=email_prefix).first()
+    return user
+
+
+def build_snapshot(user):
+    """Everything the config API can return for a user, as a JSON-ready dict."""
+    if user is None:
+        return {'missing': NOT_FOUND}
+    try:
+        ai_config = user.ai_config
+    except AIAgentConfig.DoesNotExist:
+        return {'missing': NO_CONFIG}
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        profile = None
+
+    expiry = profile.subscription_expiry if profile else None
+    return {
+        'email': user.email,
+        'email_prefix': user.get_email_prefix(),
+        'agent_enabled': ai_config.is_active,
+        'has_profile': profile is not None,
+        'subscription_expiry': expiry.timestamp() if expiry else None,
+        'fb_page_id': ai_config.facebook_page_id or '',
+        'fb_page_api': ai_config.facebook_page_api or '',
+        'system_prompt': ai_config.system_prompt or '',
+        'webhook_url': ai_config.get_webhook_url(),
+        'blocked_post_ids': ai_config.get_blocked_post_ids_list(),
+        'config_version': ai_config.config_version,
+    }
+
+
+def versions(email_prefix):
+    """Query for the config_version of the user find_user() would pick."""
+    match = Q(user__email_prefix=email_prefix)
+    if '@' in email_prefix:
+        match |= Q(user__email=email_prefix)
+    return AIAgentConfig.objects.filter(match).order_by('user_id').values_list('config_version', flat=True)
+
+
+def _ttl(snapshot):
+    return settings.CONFIG_SNAPSHOT_TTL if 'missing' not in snapshot else settings.CONFIG_SNAPSHOT_MISS_TTL
+
+
+def rebuild(email_prefix):
+    """Rebuild and store the snapshot an API call for email_prefix would be served."""
+    snapshot = build_snapshot(find_user(email_prefix))
+    _cache().set(_key(email_prefix), snapshot, _ttl(snapshot))
+    return snapshot
+
+
+def invalidate(email_prefix):
+    _cache().delete(_key(email_prefix))
+
+
+def get_snapshot(email_prefix):
+    """The stored snapshot for email_prefix, built from the database only on a cache miss."""
+    snapshot = _cache().get(_key(email_prefix))
+    if snapshot is None:
+        snapshot = rebuild(email_prefix)
+    return snapshot
+
+
+def get_snapshots(email_prefixes):
+    """
+    Snapshots for many prefixes -> {prefix: snapshot}. Cache misses are built
+    from a single query for all of them.
+    """
+    keys = {_key(prefix): prefix for prefix in email_prefixes}
+    snapshots = {keys[key]: snapshot for key, snapshot in _cache().get_many(list(keys)).items()}
+    missing = [prefix for prefix in keys.values() if prefix not in snapshots]
+    if not missing:
+        return snapshots
+
+    # Same matching as find_user(): by prefix, or by the whole email
+    users = CustomUser.objects.select_related('ai_config', 'profile').filter(
+        Q(email_prefix__in=missing) | Q(email__in=[prefix for prefix in missing if '@' in prefix])
+    )
+    by_prefix = {}
+    for user in users:
+        if user.email_prefix:
+            by_prefix[user.email_prefix] = user
+        by_prefix.setdefault(user.email, user)
+
+    built = {prefix: build_snapshot(by_prefix.get(prefix)) for prefix in missing}
+    for ttl in {_ttl(snapshot) for snapshot in built.values()}:
+        _cache().set_many(
+            {_key(prefix): snapshot for prefix, snapshot in built.items() if _ttl(snapshot) == ttl}, ttl
+        )
+    snapshots.update(built)
+    return snapshots
+
+
+def resolve(snapshot, now=None):
+    """The API view of a snapshot, with the subscription checked against the clock."""
+    if not snapshot['has_profile']:
+        subscription_active = False
+    else:
+        # No expiry set means access is allowed, as in UserProfile.is_subscription_active()
+        expiry = snapshot['subscription_expiry']
+        subscription_active = expiry is None or (now or time.time()) < expiry
+    effective_active = snapshot['agent_enabled'] and subscription_active
+
+    data = {field: snapshot[field] for field in FIELDS if field in snapshot}
+    data.update(
+        ai_agent_status='on' if effective_active else 'off',
+        is_active=effective_active,
+        subscription_active=subscription_active,
+    )
+    return {field: data.get(field) for field in FIELDS}
+
+
+def etag(config):
+    """Validator of a resolved config: its version, plus the subscription state that changes without a save."""
+    return f'"{config["config_version"]}-{int(config["subscription_active"])}"'
@@ -0,0 +1,132 @@
+"""
+Facebook Page feed loading for the feed page.
+
+The page name and its latest posts come from one Graph request using field
+expansion (fields=name,feed{...}) instead of a call for the page followed by
+a call for its feed. The result is kept in Django's cache for FEED_CACHE_TTL
+seconds per page, so reloads and back-navigation skip the Graph API. Posting
+from the panel and deleting comments invalidate the page's entry. The cache
+must be shared (see CACHES in settings) because posts are published by the
+process_post_jobs worker, not by the web worker that serves the feed.
+
+Only the first FEED_PAGE_SIZE posts are loaded up front. Older posts are
+fetched on demand with Graph's "after" cursor through load_feed_page().
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import graph
+from .singleflight import SingleFlight
+
+FEED_PAGE_SIZE = 25
+MAX_FEED_PAGE_SIZE = 100
+POST_FIELDS = 'id,message,created_time,full_picture,permalink_url'
+
+FEED_CACHE_KEY = 'feed:{page_id}'
+
+# Concurrent feed loads for the same page share one Graph call. Followers
+# wait as long as the call itself can take, with all its retries.
+feed_fetches = SingleFlight(wait_timeout=(
+    (settings.GRAPH_CONNECT_TIMEOUT + settings.GRAPH_READ_TIMEOUT) * (1 + settings.GRAPH_MAX_RETRIES)
+    + settings.GRAPH_THROTTLE_MAX_WAIT
+))
+
+
+class CacheStats:
+    """Per-process hit/miss counters of the feed cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def incr(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'ttl': settings.FEED_CACHE_TTL,
+            }
+
+
+feed_cache_stats = CacheStats()
+
+
+def _next_cursor(feed):
+    """The "after" cursor of a feed edge, or None on its last page."""
+    paging = feed.get('paging', {})
+    if not paging.get('next'):
+        return None
+    return paging.get('cursors', {}).get('after')
+
+
+def _fetch_feed(page_id, access_token):
+    response = graph.get(page_id, params={
+        'fields': f'name,feed.limit({FEED_PAGE_SIZE}){{{POST_FIELDS}}}',
+        'access_token': access_token,
+    })
+    data = response.json()
+    if response.status_code != 200:
+        return None, [], None, data.get('error', {}).get('message', 'Failed to fetch feed.')
+    feed = data.get('feed', {})
+    return data.get('name', 'Unknown Page'), feed.get('data', []), _next_cursor(feed), None
+
+
+def load_feed(page_id, access_token):
+    """
+    Return the page name and first page of posts, from cache or the Graph API
+    -> (page_name, posts, next_cursor, error)
+    """
+    # Only serve a cached feed to callers holding the token it was fetched with
+    token_key = hashlib.sha1(access_token.encode()).hexdigest()
+    key = FEED_CACHE_KEY.format(page_id=page_id)
+
+    cached = cache.get(key)
+    if cached is not None and cached['token'] == token_key:
+        feed_cache_stats.incr('hits')
+        return cached['page_name'], cached['posts'], cached['next_cursor'], None
+
+    feed_cache_stats.incr('misses')
+    page_name, posts, next_cursor, error = feed_fetches.do(
+        (page_id, token_key), _fetch_feed, page_id, access_token
+    )
+    if error is None:
+        cache.set(key, {
+            'token': token_key,
+            'page_name': page_name,
+            'posts': posts,
+            'next_cursor': next_cursor,
+        }, settings.FEED_CACHE_TTL)
+    return page_name, posts, next_cursor, error
+
+
+def load_feed_page(page_id, access_token, after, limit=FEED_PAGE_SIZE):
+    """Fetch the posts following an "after" cursor -> (posts, next_cursor, error)"""
+    response = graph.get(f'{page_id}/feed', params={
+        'fields': POST_FIELDS,
+        'limit': max(1, min(limit, MAX_FEED_PAGE_SIZE)),
+        'after': after,
+        'access_token': access_token,
+    })
+    data = response.json()
+    if response.status_code != 200:
+        return [], None, data.get('error', {}).get('message', 'Failed to fetch feed.')
+    return data.get('data', []), _next_cursor(data), None
+
+
+def invalidate_feed(page_id):
+    """Drop the cached feed of a page after the panel changed it."""
+    if page_id:
+        cache.delete(FEED_CACHE_KEY.format(page_id=page_id))
+        feed_cache_stats.incr('invalidations')
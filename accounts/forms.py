@@ -47,6 +47,16 @@ class CustomUserCreationForm(UserCreationForm):
         model = CustomUser
         fields = ('email', 'password1', 'password2')
 
+    def clean_email(self):
+        """The part before @ names the user's webhook and API URLs, so it must be free"""
+        email = self.cleaned_data['email']
+        prefix = email.split('@')[0]
+        if CustomUser.objects.filter(email_prefix=prefix).exists():
+            raise forms.ValidationError(
+                'An account already uses the name before "@" in this email. Please use a different email address.'
+            )
+        return email
+
 
 class CustomAuthenticationForm(AuthenticationForm):
     """Form for user login"""
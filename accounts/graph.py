@@ -0,0 +1,453 @@
+"""
+Pooled client for the Facebook Graph API.
+
+Every Graph call goes through one keep-alive requests.Session per worker
+process, so repeated calls reuse TLS connections instead of handshaking each
+time. Calls have connect/read timeouts, so a hung request cannot pin a worker
+thread. Idempotent calls (GET) are retried with jittered backoff on
+connection errors and 429/5xx. Other calls, DELETE included, are retried
+only when the connection was never made. Latency is recorded per endpoint.
+
+batch() sends many operations as Graph batch requests of up to 50 each,
+running a few batches at a time.
+
+Facebook reports how much of its rate limits the app and each page have used
+in the X-App-Usage and X-Page-Usage headers. Those are recorded on every
+response. Changes of a few points, and otherwise one refresh a minute, are
+mirrored to the default cache, which every process shares unless it is
+configured as a per-process LocMemCache, so the admin portal shows usage
+seen by the web and background workers alike. When usage nears
+the limit, calls are slowed down, retries wait longer, and a call that would
+have to wait more than GRAPH_THROTTLE_MAX_WAIT raises GraphThrottled instead
+of being sent.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+GRAPH_URL = 'https://graph.facebook.com/{version}/{path}'
+# DELETE is left out: repeating one that went through answers "object does not
+# exist", which would report a successful delete as failed
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+ID_RE = re.compile(r'^\d[\w.-]*$')
+LATENCY_SAMPLES = 500
+BATCH_LIMIT = 50  # operations per Graph batch request
+
+# Graph error codes for app (4), user (17), page (32, 80001) and API (613) rate limits
+THROTTLE_CODES = {4, 17, 32, 613, 80001}
+USAGE_METRICS = ('call_count', 'total_time', 'total_cputime')
+USAGE_CACHE_KEY = 'graph-usage:{scope}'
+USAGE_SCOPES_KEY = 'graph-usage:scopes'
+USAGE_FULL_WAIT = 60  # seconds to hold off at 100% when Graph gives no estimate
+USAGE_MIRROR_STEP = 5  # percentage points of change that are mirrored at once
+
+# When this process last made sure each scope is in the cached scope list
+_listed_scopes = {}
+# Last entry this process mirrored for each scope
+_mirrored = {}
+
+
+class GraphThrottled(requests.RequestException):
+    """A call was not sent because the app or page is at its Graph rate limit."""
+
+    def __init__(self, scope, wait):
+        self.scope = scope
+        self.wait = wait
+        super().__init__(
+            f'Facebook rate limit reached for {scope}; try again in {max(1, round(wait))} seconds.'
+        )
+
+
+class GraphError(requests.RequestException):
+    """Graph answered with a body that is not what the call expects."""
+
+
+class EndpointStats:
+    """Call count, failures and recent latencies of one endpoint."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def as_dict(self):
+        samples = sorted(self.latencies)
+        summary = {
+            'calls': self.calls, 'errors': self.errors, 'retries': self.retries, 'throttled': self.throttled,
+        }
+        if samples:
+            summary.update({
+                'p50_ms': round(statistics.median(samples) * 1000, 1),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                'max_ms': round(samples[-1] * 1000, 1),
+            })
+        return summary
+
+
+class GraphClient:
+    """Thin wrapper around a pooled requests.Session for graph.facebook.com."""
+
+    def __init__(self, version, connect_timeout, read_timeout, max_retries, pool_size, backoff=0.3):
+        self.version = version
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.backoff = backoff
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._usage = {}  # scope ("app" or "page:<id>") -> last reported usage
+
+    @property
+    def session(self):
+        # Sessions must not cross a fork (gunicorn preloads before forking workers)
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def url(self, path):
+        return GRAPH_URL.format(version=self.version, path=path.lstrip('/'))
+
+    def request(self, method, path, page_id=None, max_wait=None, **kwargs):
+        """
+        Send a Graph API request and return the requests.Response.
+        page_id attributes X-Page-Usage to a page; by default it is taken from
+        the path. Raises GraphThrottled if the call would have to wait for the
+        rate limit longer than max_wait seconds.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.url(path)
+        stats = self._endpoint_stats(method, path)
+        attempts = 1 + self.max_retries
+        page_id = page_id or _page_of(path)
+        if max_wait is None:
+            max_wait = settings.GRAPH_THROTTLE_MAX_WAIT
+
+        for attempt in range(1, attempts + 1):
+            self._throttle(stats, page_id, max_wait)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self._record(stats, time.perf_counter() - start, error=True)
+                if attempt == attempts or not self._can_retry(method, e):
+                    raise
+            else:
+                self._record(stats, time.perf_counter() - start, error=response.status_code >= 500)
+                rate_limited = self._record_usage(response, page_id)
+                if (attempt == attempts or method not in IDEMPOTENT_METHODS
+                        or (response.status_code not in RETRY_STATUSES and not rate_limited)):
+                    return response
+                if self.throttle_wait(page_id)[1] > max_wait:
+                    # Retrying would only hit the limit again; let the caller see the error
+                    return response
+                response.close()
+
+            with self._lock:
+                stats.retries += 1
+            delay = self.backoff * (2 ** (attempt - 1))
+            time.sleep(random.uniform(0, delay))  # full jitter
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def batch(self, operations, access_token, max_workers=None, page_id=None):
+        """
+        Run operations ({'method': ..., 'relative_url': ...}) as Graph batch requests.
+        Returns one {'status', 'body'} dict per operation, in order; status is None
+        when the operation got no response. Raises GraphError when Graph rejects
+        a batch as a whole.
+        """
+        chunks = [operations[i:i + BATCH_LIMIT] for i in range(0, len(operations), BATCH_LIMIT)]
+        if not chunks:
+            return []
+        workers = min(len(chunks), max_workers or settings.GRAPH_BATCH_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda chunk: self._run_pooled_batch(chunk, access_token, page_id), chunks)
+            return [result for chunk_results in results for result in chunk_results]
+
+    def _run_pooled_batch(self, chunk, access_token, page_id):
+        try:
+            return self._run_batch(chunk, access_token, page_id)
+        finally:
+            # Usage mirroring may have opened a database connection in this pool thread
+            connection.close()
+
+    def _run_batch(self, chunk, access_token, page_id):
+        def failed(message):
+            return [{'status': None, 'body': {'error': {'message': message}}} for _ in chunk]
+
+        try:
+            response = self.post('', page_id=page_id, data={'batch': json.dumps(chunk), 'access_token': access_token})
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            return failed(str(e))
+        if response.status_code != 200:
+            return failed(data.get('error', {}).get('message', 'Batch request failed'))
+        if not isinstance(data, list):
+            # Errors about the batch as a whole come back as a single error object
+            error = data.get('error', {}) if isinstance(data, dict) else {}
+            raise GraphError(error.get('message', 'Unexpected batch response from Facebook'))
+
+        results = []
+        for item in data:
+            if item is None:
+                # Graph gives up on operations it could not finish in time
+                results.append({'status': None, 'body': {'error': {'message': 'Request timed out'}}})
+                continue
+            try:
+                body = json.loads(item.get('body') or 'null')
+            except ValueError:
+                body = item.get('body')
+            results.append({'status': item.get('code'), 'body': body})
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: s.as_dict() for endpoint, s in sorted(self._stats.items())}
+
+    def usage(self):
+        """Last reported usage of the app and every page this worker has called."""
+        with self._lock:
+            return {scope: dict(entry) for scope, entry in self._usage.items()}
+
+    def throttle_wait(self, page_id=None):
+        """
+        How long to hold off before calling Graph for page_id -> (scope, seconds).
+        Below GRAPH_USAGE_THROTTLE percent there is no wait; above it the wait
+        grows towards GRAPH_THROTTLE_MAX_DELAY as usage nears 100%.
+        """
+        now = time.time()
+        threshold = settings.GRAPH_USAGE_THROTTLE
+        scope, wait = None, 0.0
+        with self._lock:
+            entries = [self._usage.get('app')]
+            if page_id:
+                entries.append(self._usage.get(f'page:{page_id}'))
+        for entry in entries:
+            if not entry or now - entry['updated_at'] > settings.GRAPH_USAGE_TTL:
+                continue
+            if entry['regain_at'] and entry['regain_at'] > now:
+                entry_wait = entry['regain_at'] - now
+            elif entry['percent'] >= 100:
+                entry_wait = max(0.0, entry['updated_at'] + USAGE_FULL_WAIT - now)
+            elif entry['percent'] >= threshold:
+                entry_wait = settings.GRAPH_THROTTLE_MAX_DELAY * (entry['percent'] - threshold) / (100 - threshold)
+            else:
+                continue
+            if entry_wait > wait:
+                scope, wait = entry['scope'], entry_wait
+        return scope, wait
+
+    def _throttle(self, stats, page_id, max_wait):
+        scope, wait = self.throttle_wait(page_id)
+        if not wait:
+            return
+        with self._lock:
+            stats.throttled += 1
+        if wait > max_wait:
+            raise GraphThrottled(scope, wait)
+        logger.info('Graph %s usage is high; waiting %.1fs before %s', scope, wait, stats.endpoint)
+        time.sleep(wait)
+
+    def _record_usage(self, response, page_id):
+        """Store the usage headers of a response; True if Graph refused it for a rate limit."""
+        headers = getattr(response, 'headers', None) or {}
+        reported = {'app': _parse_usage(headers.get('X-App-Usage'))}
+        if page_id:
+            reported[f'page:{page_id}'] = _parse_usage(headers.get('X-Page-Usage'))
+
+        rate_limited = False
+        if response.status_code in (400, 403, 429):
+            code = _error_code(response)
+            rate_limited = code in THROTTLE_CODES
+            if rate_limited:
+                # The error itself says the limit is reached, whatever the headers say
+                scope = 'app' if code == 4 or not page_id else f'page:{page_id}'
+                usage = reported.get(scope) or {}
+                usage['percent'] = max(usage.get('percent', 0), 100)
+                reported[scope] = usage
+
+        now = time.time()
+        for scope, usage in reported.items():
+            if usage is None:
+                continue
+            entry = {metric: usage.get(metric, 0) for metric in USAGE_METRICS}
+            entry.update(
+                scope=scope,
+                percent=usage.get('percent', max(entry.values())),
+                regain_at=now + usage['regain_minutes'] * 60 if usage.get('regain_minutes') else None,
+                updated_at=now,
+            )
+            with self._lock:
+                self._usage[scope] = entry
+            _mirror_usage(entry)
+        return rate_limited
+
+    def _can_retry(self, method, error):
+        if method in IDEMPOTENT_METHODS:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        # The request never left, so even a POST is safe to send again
+        return isinstance(error, requests.ConnectTimeout)
+
+    def _endpoint_stats(self, method, path):
+        # "1234_5678/comments" -> "GET {id}/comments"
+        parts = ['{id}' if ID_RE.match(part) else part for part in path.strip('/').split('/')]
+        endpoint = f"{method} {'/'.join(parts) or '(batch)'}"
+        with self._lock:
+            if endpoint not in self._stats:
+                self._stats[endpoint] = EndpointStats(endpoint)
+            return self._stats[endpoint]
+
+    def _record(self, stats, elapsed, error=False):
+        with self._lock:
+            stats.calls += 1
+            stats.errors += error
+            stats.latencies.append(elapsed)
+        logger.debug('Graph %s took %.0f ms', stats.endpoint, elapsed * 1000)
+
+
+def _page_of(path):
+    """Page ID a path starts with, or None ("1234/feed" -> "1234"; post and comment IDs are skipped)."""
+    first = path.strip('/').split('/', 1)[0]
+    if first.isdigit():
+        return first
+    return None
+
+
+def _parse_usage(header):
+    """Decode an X-App-Usage / X-Page-Usage header into percentages, or None."""
+    if not header:
+        return None
+    try:
+        data = json.loads(header)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    usage = {}
+    for metric in USAGE_METRICS:
+        try:
+            usage[metric] = float(data.get(metric) or 0)
+        except (TypeError, ValueError):
+            usage[metric] = 0.0
+    usage['percent'] = max(usage.values())
+    try:
+        usage['regain_minutes'] = float(data.get('estimated_time_to_regain_access') or 0)
+    except (TypeError, ValueError):
+        usage['regain_minutes'] = 0.0
+    return usage
+
+
+def _error_code(response):
+    try:
+        return response.json().get('error', {}).get('code')
+    except (ValueError, AttributeError):
+        return None
+
+
+def _should_mirror(entry):
+    """
+    Whether a usage entry is worth a cache write: the process's own _usage is
+    what throttling reads, so the cache only needs real changes, and a refresh
+    every GRAPH_USAGE_MIRROR_INTERVAL to keep the entry from expiring.
+    """
+    last = _mirrored.get(entry['scope'])
+    return (
+        last is None
+        or abs(entry['percent'] - last['percent']) >= USAGE_MIRROR_STEP
+        or bool(entry['regain_at']) != bool(last['regain_at'])
+        or entry['updated_at'] - last['updated_at'] >= settings.GRAPH_USAGE_MIRROR_INTERVAL
+    )
+
+
+def _mirror_usage(entry):
+    """Copy a usage entry to the shared cache, where the admin portal reads it."""
+    scope = entry['scope']
+    if not _should_mirror(entry):
+        return
+    _mirrored[scope] = entry
+    try:
+        cache.set(USAGE_CACHE_KEY.format(scope=scope), entry, settings.GRAPH_USAGE_TTL)
+        # Re-checked every TTL, since another process may overwrite the list or the cache may evict it
+        if entry['updated_at'] - _listed_scopes.get(scope, 0) > settings.GRAPH_USAGE_TTL:
+            scopes = set(cache.get(USAGE_SCOPES_KEY) or [])
+            if scope not in scopes:
+                scopes.add(scope)
+                cache.set(USAGE_SCOPES_KEY, sorted(scopes), None)
+            _listed_scopes[scope] = entry['updated_at']
+    except Exception:
+        # Usage reporting must never break a Graph call
+        logger.warning('Could not store Graph usage for %s', scope, exc_info=True)
+
+
+def usage_is_shared():
+    """False when the cache is per-process, so cached_usage() only holds this process's calls."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def cached_usage():
+    """Latest usage of every scope seen by any worker sharing the cache, freshest first."""
+    scopes = cache.get(USAGE_SCOPES_KEY) or []
+    keys = {USAGE_CACHE_KEY.format(scope=scope): scope for scope in scopes}
+    entries = list(cache.get_many(list(keys)).values())
+    return sorted(entries, key=lambda entry: entry['updated_at'], reverse=True)
+
+
+client = GraphClient(
+    version=settings.GRAPH_API_VERSION,
+    connect_timeout=settings.GRAPH_CONNECT_TIMEOUT,
+    read_timeout=settings.GRAPH_READ_TIMEOUT,
+    max_retries=settings.GRAPH_MAX_RETRIES,
+    pool_size=settings.GRAPH_POOL_SIZE,
+)
+
+
+def get(path, **kwargs):
+    return client.get(path, **kwargs)
+
+
+def post(path, **kwargs):
+    return client.post(path, **kwargs)
+
+
+def delete(path, **kwargs):
+    return client.delete(path, **kwargs)
+
+
+def batch(operations, access_token, max_workers=None, page_id=None):
+    return client.batch(operations, access_token, max_workers=max_workers, page_id=page_id)
@@ -0,0 +1,69 @@
+"""
+Image pre-processing for Facebook photo uploads.
+
+Phone photos are often 4000px+ and several MB, while Facebook shows photos
+at up to 2048px. Before a queued photo is uploaded, prepare_upload() applies
+the EXIF orientation and downscales it to POST_IMAGE_MAX_DIMENSION. It then
+re-encodes the image as JPEG, or as WebP when it has transparency. The
+original is kept whenever the result would not be smaller.
+
+It runs in process_post_jobs' pool threads. Pillow releases the GIL while
+decoding, resizing and encoding, so several uploads are processed in
+parallel.
+"""
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def prepare_upload(fileobj, original_size):
+    """
+    Return (file, content_type, extension) of a smaller version of the image,
+    or None when the original should be uploaded as is. The caller closes the file.
+    """
+    max_dimension = settings.POST_IMAGE_MAX_DIMENSION
+    try:
+        with Image.open(fileobj) as image:
+            if getattr(image, 'is_animated', False):
+                return None
+            # Let the JPEG decoder scale down while reading instead of decoding every pixel
+            image.draft('RGB', (max_dimension, max_dimension))
+            processed = ImageOps.exif_transpose(image)
+            processed.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            output = tempfile.TemporaryFile()
+            if _has_alpha(processed):
+                processed.save(output, 'WEBP', quality=settings.POST_IMAGE_QUALITY, method=4)
+                content_type, extension = 'image/webp', '.webp'
+            else:
+                processed.convert('RGB').save(
+                    output, 'JPEG', quality=settings.POST_IMAGE_QUALITY, optimize=True, progressive=True
+                )
+                content_type, extension = 'image/jpeg', '.jpg'
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.info('Uploading image unprocessed: %s', e)
+        return None
+    finally:
+        fileobj.seek(0)
+
+    if output.tell() >= original_size:
+        output.close()
+        return None
+    output.seek(0)
+    return output, content_type, extension
+
+
+def file_size(fileobj):
+    position = fileobj.tell()
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return size
@@ -0,0 +1,105 @@
+"""
+Management command comparing the pandas report path with report_engine.
+
+Measures, in fresh interpreter processes, the cold start of a worker
+(django.setup() + importing accounts.views) and its peak RSS, with and
+without pandas loaded. Then it times parsing a synthetic sheet export with
+both parsers.
+
+Usage:
+    python manage.py benchmark_report_engine
+    python manage.py benchmark_report_engine --rows 50000 --repeat 7
+"""
+import io
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.report_engine import parse_csv
+
+COLD_START_SCRIPT = '''
+import os, resource, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'userpanel_project.settings')
+import django
+django.setup()
+import accounts.views
+if {with_pandas}:
+    import pandas
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def _sample_csv(rows):
+    lines = ['Name,Comment,Reply,Post ID,Comment ID,Time']
+    for i in range(rows):
+        lines.append(
+            f'User {i % 500},"দাম কত? price please #{i}","ইনবক্স চেক করুন, thanks!",'
+            f'1234_{i % 40},{i},2026-10-17 10:{i % 60:02d}'
+        )
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark worker cold start/RSS and CSV parsing with and without pandas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Rows in the synthetic sheet (default: 20000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Cold starts per variant (default: 5)')
+
+    def _cold_start(self, with_pandas, repeat):
+        times, rss = [], []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', COLD_START_SCRIPT.format(with_pandas=with_pandas)],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            times.append(float(output[0]))
+            rss.append(int(output[1]) / 1024)  # ru_maxrss is in KiB on Linux
+        return statistics.median(times), statistics.median(rss)
+
+    def _measure(self, fn):
+        # Timed and traced separately: tracemalloc slows pure-Python code far more than C code
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak / (1024 * 1024)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+
+        self.stdout.write(f'Worker cold start (django.setup + import accounts.views), median of {repeat}:')
+        try:
+            before = self._cold_start(True, repeat)
+            self.stdout.write(f'  before (pandas loaded)  {before[0]:.3f} s   max RSS {before[1]:.1f} MB')
+        except subprocess.CalledProcessError:
+            self.stdout.write('  before (pandas loaded)  skipped, pandas is not installed')
+        after = self._cold_start(False, repeat)
+        self.stdout.write(f'  after  (report_engine)  {after[0]:.3f} s   max RSS {after[1]:.1f} MB')
+
+        content = _sample_csv(options['rows'])
+        self.stdout.write('')
+        self.stdout.write(f'Parse {options["rows"]} rows ({len(content) / (1024 * 1024):.1f} MB CSV):')
+        try:
+            import pandas as pd
+
+            def parse_with_pandas():
+                df = pd.read_csv(io.BytesIO(content), encoding='utf-8').fillna('')
+                return [tuple(row) for row in df.values.tolist()]
+
+            elapsed, peak = self._measure(parse_with_pandas)
+            self.stdout.write(f'  pandas.read_csv         {elapsed * 1000:.0f} ms   peak {peak:.1f} MB')
+        except ImportError:
+            self.stdout.write('  pandas.read_csv         skipped, pandas is not installed')
+
+        elapsed, peak = self._measure(lambda: parse_csv(content))
+        self.stdout.write(f'  report_engine           {elapsed * 1000:.0f} ms   peak {peak:.1f} MB')
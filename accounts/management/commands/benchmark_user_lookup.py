@@ -0,0 +1,94 @@
+"""
+Management command comparing email-prefix user lookups before and after the
+indexed email_prefix column.
+
+Creates a batch of throwaway users inside a transaction that is rolled back
+at the end, then times lookups of existing and unknown prefixes both ways:
+the old email__startswith query with its email__icontains fallback, and the
+single equality query on email_prefix. The database's query plans are shown
+as well.
+
+Usage:
+    python manage.py benchmark_user_lookup
+    python manage.py benchmark_user_lookup --users 100000 --lookups 2000
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import CustomUser
+
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def _old_lookup(prefix):
+    user = CustomUser.objects.filter(email__startswith=prefix + '@').first()
+    if not user:
+        user = CustomUser.objects.filter(email__icontains=prefix).first()
+    return user
+
+
+def _new_lookup(prefix):
+    return CustomUser.objects.filter(email_prefix=prefix).first()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark user lookups by email prefix with and without the email_prefix index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Throwaway users to create (default: 100000)')
+        parser.add_argument('--lookups', type=int, default=1000, help='Lookups per variant (default: 1000)')
+
+    def _time(self, lookup, prefixes):
+        start = time.perf_counter()
+        for prefix in prefixes:
+            lookup(prefix)
+        return (time.perf_counter() - start) / len(prefixes)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Throwaway users rolled back.')
+
+    def _run(self, options):
+        count = options['users']
+        self.stdout.write(f'Creating {count} throwaway users...')
+        for start in range(0, count, BATCH_SIZE):
+            CustomUser.objects.bulk_create([
+                # bulk_create skips save(), so the prefix is set here
+                CustomUser(email=f'bench{i}@bench.example', email_prefix=f'bench{i}', password='!')
+                for i in range(start, min(start + BATCH_SIZE, count))
+            ])
+
+        lookups = options['lookups']
+        hits = [f'bench{random.randrange(count)}' for _ in range(lookups)]
+        misses = [f'nobody{i}' for i in range(lookups)]
+
+        self.stdout.write('')
+        self.stdout.write(f'Mean lookup time over {lookups} lookups, {count} users:')
+        for label, prefixes in (('existing prefix', hits), ('unknown prefix ', misses)):
+            before = self._time(_old_lookup, prefixes)
+            after = self._time(_new_lookup, prefixes)
+            self.stdout.write(
+                f'  {label}  startswith/icontains {before * 1000:8.3f} ms   '
+                f'email_prefix {after * 1000:8.3f} ms   ({before / after:.0f}x)'
+            )
+
+        self.stdout.write('')
+        self.stdout.write('Query plans:')
+        plans = (
+            ('email__icontains', CustomUser.objects.filter(email__icontains='nobody')),
+            ('email_prefix    ', CustomUser.objects.filter(email_prefix='nobody')),
+        )
+        for label, queryset in plans:
+            plan = ' | '.join(line.strip() for line in queryset.explain().splitlines())
+            self.stdout.write(f'  {label}  {plan}')
@@ -0,0 +1,90 @@
+"""
+Management command that publishes scheduled Facebook posts when they are due.
+Due posts are read in publish_at order through the partial index on waiting
+posts. They are published a few at a time with the page token from each
+user's AI Agent configuration.
+
+Usage:
+    python manage.py dispatch_scheduled_posts                 # publish what is due and exit
+    python manage.py dispatch_scheduled_posts --interval 30   # keep running, checking every 30s
+
+entrypoint.sh runs it as a long-running worker next to Gunicorn.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.db import close_old_connections, connection
+from django.core.management.base import BaseCommand
+from accounts.publishing import claim_due_posts, fail_stale_scheduled_posts, publish_scheduled_post
+
+
+def _publish(post):
+    """Publish one scheduled post in a pool thread"""
+    try:
+        return publish_scheduled_post(post)
+    finally:
+        # Each pool thread holds its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Publish scheduled Facebook posts that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of posts published concurrently (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Due posts claimed per round (default: 50)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Seconds between checks; 0 runs once and exits (default: 0)',
+        )
+
+    def run_once(self, options):
+        stale = fail_stale_scheduled_posts()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'  ✗ {stale} interrupted post(s) marked as failed'))
+
+        published_count = 0
+        failed_count = 0
+        deferred_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            while not deferred_count:
+                posts = claim_due_posts(options['batch_size'])
+                if not posts:
+                    break
+                for post in pool.map(_publish, posts):
+                    if post.status == 'SCHEDULED':
+                        # Deferred by the Graph rate limit; retried on the next check
+                        deferred_count += 1
+                        self.stdout.write(self.style.WARNING(f'  … {post.user.email} — {post.error}'))
+                    elif post.status == 'PUBLISHED':
+                        published_count += 1
+                        self.stdout.write(self.style.SUCCESS(f'  ✓ {post.user.email} — {post.facebook_post_id}'))
+                    else:
+                        failed_count += 1
+                        self.stdout.write(self.style.ERROR(f'  ✗ {post.user.email} — {post.error}'))
+
+        if published_count or failed_count or deferred_count:
+            self.stdout.write(self.style.SUCCESS(
+                f'Done. Published: {published_count}, Failed: {failed_count}, Deferred: {deferred_count}'
+            ))
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            close_old_connections()
+            self.run_once(options)
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,111 @@
+"""
+Management command to keep report sheets warm for active users.
+Syncs the Google Sheet of every user who viewed their report recently or
+has a paid subscription, so /report/ almost always finds fresh rows in the
+database instead of waiting on the Google export.
+
+Usage:
+    python manage.py prefetch_reports                 # run once
+    python manage.py prefetch_reports --interval 30   # keep running, every 30s
+
+Run it once per REPORT_CACHE_TTL (cron) or as a long-running worker with
+--interval. Set REPORT_PREFETCH_INTERVAL to start it from entrypoint.sh.
+Each run also prunes old on-disk snapshots (see accounts/report_store.py).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts import report_store
+from accounts.models import AIAgentConfig
+from accounts.report_sync import sync_report
+
+
+def _prefetch(config):
+    """Sync one report in a pool thread -> (config, sheet, error)"""
+    try:
+        return config, sync_report(config), None
+    except Exception as e:
+        return config, None, e
+    finally:
+        # Each pool thread holds its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Prefetch Google Sheet reports for recently active and subscribed users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of sheets fetched concurrently (default: 4)',
+        )
+        parser.add_argument(
+            '--recent-hours',
+            type=int,
+            default=24,
+            help='Include users who viewed their report within this many hours (default: 24)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Seconds between runs; 0 runs once and exits (default: 0)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List which reports would be prefetched without fetching them',
+        )
+
+    def get_configs(self, recent_hours):
+        now = timezone.now()
+        cutoff = now - timezone.timedelta(hours=recent_hours)
+        return list(
+            AIAgentConfig.objects.exclude(google_sheet_id='')
+            .filter(user__is_active=True)
+            .filter(Q(report_sheet__last_viewed_at__gte=cutoff) | Q(user__profile__subscription_expiry__gt=now))
+            .select_related('user')
+            .distinct()
+        )
+
+    def run_once(self, options):
+        configs = self.get_configs(options['recent_hours'])
+        if not configs:
+            self.stdout.write('No active reports to prefetch.')
+            return
+
+        if options['dry_run']:
+            for config in configs:
+                self.stdout.write(f'  [DRY RUN] {config.user.email} — sheet {config.google_sheet_id}')
+            return
+
+        synced_count = 0
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for config, sheet, error in pool.map(_prefetch, configs):
+                if error is None:
+                    synced_count += 1
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {config.user.email} — {sheet.row_count} rows'))
+                else:
+                    failed_count += 1
+                    self.stdout.write(self.style.ERROR(f'  ✗ {config.user.email} — {error}'))
+
+        removed = report_store.cleanup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Synced: {synced_count}, Failed: {failed_count}, Snapshots removed: {removed}'
+        ))
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            close_old_connections()
+            self.run_once(options)
+            if interval <= 0:
+                break
+            time.sleep(interval)
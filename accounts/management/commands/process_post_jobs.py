@@ -0,0 +1,84 @@
+"""
+Management command that publishes queued Facebook posts.
+Takes PostJobs created by the feed page's Create Post form and uploads
+them to the Graph API, downscaling photos and streaming them from disk.
+
+Usage:
+    python manage.py process_post_jobs                # drain the queue and exit
+    python manage.py process_post_jobs --interval 2   # keep running, polling every 2s
+
+entrypoint.sh runs it as a long-running worker next to Gunicorn.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.db import close_old_connections, connection
+from django.core.management.base import BaseCommand
+from accounts.publishing import claim_next_job, fail_stale_jobs, publish_job
+
+
+def _work(_):
+    """Publish jobs in a pool thread until the queue is empty -> (published, failed, deferred, bytes saved)"""
+    published = failed = deferred = saved = 0
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return published, failed, deferred, saved
+            job = publish_job(job)
+            if job.status == 'PENDING':
+                # Deferred by the Graph rate limit until its available_at
+                deferred += 1
+            elif job.status == 'DONE':
+                published += 1
+            else:
+                failed += 1
+            if job.original_size and job.upload_size:
+                saved += job.original_size - job.upload_size
+    finally:
+        # Each pool thread holds its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Publish queued Facebook posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of posts uploaded concurrently (default: 2)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Seconds between queue checks; 0 drains the queue once and exits (default: 0)',
+        )
+
+    def run_once(self, workers):
+        stale = fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'  ✗ {stale} interrupted job(s) marked as failed'))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_work, range(workers)))
+        published = sum(r[0] for r in results)
+        failed = sum(r[1] for r in results)
+        deferred = sum(r[2] for r in results)
+        saved = sum(r[3] for r in results)
+        if published or failed or deferred:
+            self.stdout.write(self.style.SUCCESS(
+                f'Done. Published: {published}, Failed: {failed}, Deferred: {deferred}, Image bytes saved: {saved}'
+            ))
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        workers = max(1, options['workers'])
+        while True:
+            close_old_connections()
+            self.run_once(workers)
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,88 @@
+"""
+Management command that re-checks Facebook page tokens with Graph's debug_token.
+Tokens are checked when they are saved; this catches ones that expire or are
+revoked afterwards. Only configs whose last check is older than
+--max-age-hours (or that were never checked) are looked at.
+
+Usage:
+    python manage.py refresh_token_health                    # check stale tokens and exit
+    python manage.py refresh_token_health --interval 3600    # keep running, checking hourly
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import AIAgentConfig
+from accounts.token_health import check_token
+
+
+def _check(config):
+    """Check one config's token in a pool thread"""
+    try:
+        return config, check_token(config)
+    finally:
+        # Each pool thread holds its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Re-check Facebook page tokens with debug_token'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours',
+            type=float,
+            default=6,
+            help='Re-check tokens last checked longer ago than this (default: 6)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of tokens checked concurrently (default: 4)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Seconds between runs; 0 runs once and exits (default: 0)',
+        )
+
+    def run_once(self, options):
+        cutoff = timezone.now() - timezone.timedelta(hours=options['max_age_hours'])
+        configs = list(
+            AIAgentConfig.objects.exclude(facebook_page_api='')
+            .filter(Q(token_health__isnull=True) | Q(token_health__checked_at__lt=cutoff))
+            .select_related('user')
+        )
+        if not configs:
+            return
+
+        valid_count = invalid_count = error_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for config, health in pool.map(_check, configs):
+                if health is None:
+                    error_count += 1
+                    self.stdout.write(self.style.WARNING(f'  ? {config.user.email} — check failed'))
+                elif health.is_valid:
+                    valid_count += 1
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {config.user.email}'))
+                else:
+                    invalid_count += 1
+                    self.stdout.write(self.style.ERROR(f'  ✗ {config.user.email} — {health.error}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Valid: {valid_count}, Invalid: {invalid_count}, Unchecked: {error_count}'
+        ))
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            close_old_connections()
+            self.run_once(options)
+            if interval <= 0:
+                break
+            time.sleep(interval)
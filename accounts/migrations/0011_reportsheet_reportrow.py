@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_userprofile_kyc_rejection_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSheet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_id', models.CharField(blank=True, max_length=200)),
+                ('columns', models.JSONField(blank=True, default=list)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('content_digest', models.CharField(blank=True, help_text='SHA-1 of the last synced CSV export', max_length=40)),
+                ('version', models.PositiveIntegerField(default=0, help_text='Bumped every time the stored rows change')),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+                ('config', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='report_sheet', to='accounts.aiagentconfig')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_index', models.PositiveIntegerField()),
+                ('data', models.JSONField(default=list)),
+                ('search_text', models.TextField(blank=True, help_text='Lower-cased cell values used for searching')),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_rows', to='accounts.aiagentconfig')),
+            ],
+            options={
+                'ordering': ['-row_index'],
+                'constraints': [models.UniqueConstraint(fields=('config', 'row_index'), name='unique_report_row_index')],
+            },
+        ),
+    ]
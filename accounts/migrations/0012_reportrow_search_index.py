@@ -0,0 +1,82 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:05
+
+from django.db import migrations
+
+
+# SQLite: external-content FTS5 table kept in sync with accounts_reportrow by
+# triggers. Note that a table rebuild of accounts_reportrow by a later
+# migration drops these triggers, so such a migration must recreate them.
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS accounts_reportrow_fts
+       USING fts5(search_text, content='accounts_reportrow', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_reportrow_fts_ai AFTER INSERT ON accounts_reportrow BEGIN
+         INSERT INTO accounts_reportrow_fts(rowid, search_text) VALUES (new.id, new.search_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_reportrow_fts_ad AFTER DELETE ON accounts_reportrow BEGIN
+         INSERT INTO accounts_reportrow_fts(accounts_reportrow_fts, rowid, search_text)
+         VALUES ('delete', old.id, old.search_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_reportrow_fts_au AFTER UPDATE ON accounts_reportrow BEGIN
+         INSERT INTO accounts_reportrow_fts(accounts_reportrow_fts, rowid, search_text)
+         VALUES ('delete', old.id, old.search_text);
+         INSERT INTO accounts_reportrow_fts(rowid, search_text) VALUES (new.id, new.search_text);
+       END""",
+    "INSERT INTO accounts_reportrow_fts(accounts_reportrow_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS accounts_reportrow_fts_ai",
+    "DROP TRIGGER IF EXISTS accounts_reportrow_fts_ad",
+    "DROP TRIGGER IF EXISTS accounts_reportrow_fts_au",
+    "DROP TABLE IF EXISTS accounts_reportrow_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE INDEX IF NOT EXISTS accounts_reportrow_search_tsv
+       ON accounts_reportrow USING gin (to_tsvector('simple', search_text))""",
+    """CREATE INDEX IF NOT EXISTS accounts_reportrow_search_trgm
+       ON accounts_reportrow USING gin (search_text gin_trgm_ops)""",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS accounts_reportrow_search_tsv",
+    "DROP INDEX IF EXISTS accounts_reportrow_search_trgm",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD[:1])
+        except Exception:
+            # SQLite built without FTS5: report search falls back to LIKE
+            return
+        _run(schema_editor, SQLITE_FORWARD[1:])
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_reportsheet_reportrow'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
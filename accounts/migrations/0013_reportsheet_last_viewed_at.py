@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_reportrow_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportsheet',
+            name='last_viewed_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the user opened or polled the report', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_postjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postjob',
+            name='original_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Bytes uploaded by the user', null=True),
+        ),
+        migrations.AddField(
+            model_name='postjob',
+            name='upload_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Bytes sent to Facebook after processing', null=True),
+        ),
+    ]
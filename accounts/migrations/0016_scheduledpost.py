@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_postjob_image_sizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField(blank=True)),
+                ('image', models.FileField(blank=True, null=True, upload_to='post_uploads/scheduled/')),
+                ('image_content_type', models.CharField(blank=True, max_length=100)),
+                ('publish_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('PUBLISHING', 'Publishing'), ('PUBLISHED', 'Published'), ('FAILED', 'Failed'), ('CANCELLED', 'Cancelled')], default='SCHEDULED', max_length=20)),
+                ('facebook_post_id', models.CharField(blank=True, max_length=200)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_posts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['publish_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'SCHEDULED')), fields=['publish_at'], name='scheduledpost_due')],
+            },
+        ),
+    ]
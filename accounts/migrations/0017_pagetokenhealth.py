@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_scheduledpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageTokenHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_fingerprint', models.CharField(help_text='SHA-1 of the token that was checked', max_length=40)),
+                ('is_valid', models.BooleanField(help_text='Unknown until the first check completes', null=True)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Empty for tokens that never expire', null=True)),
+                ('scopes', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('config', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='token_health', to='accounts.aiagentconfig')),
+            ],
+        ),
+    ]
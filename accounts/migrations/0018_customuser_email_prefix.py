@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_email_prefix(apps, schema_editor):
+    """Give every user their prefix; on a clash the oldest account keeps it, as lookups did."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    taken = set()
+    batch = []
+    for pk, email in CustomUser.objects.order_by('pk').values_list('pk', 'email').iterator(chunk_size=BATCH_SIZE):
+        prefix = email.split('@')[0] if '@' in email else email
+        if prefix in taken:
+            continue
+        taken.add(prefix)
+        batch.append(CustomUser(pk=pk, email_prefix=prefix))
+        if len(batch) >= BATCH_SIZE:
+            CustomUser.objects.bulk_update(batch, ['email_prefix'])
+            batch = []
+    if batch:
+        CustomUser.objects.bulk_update(batch, ['email_prefix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_pagetokenhealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='email_prefix',
+            field=models.CharField(blank=True, editable=False, help_text='Part of the email before @, kept in sync on save; empty if an older account already uses it', max_length=254, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_email_prefix, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_customuser_email_prefix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiagentconfig',
+            name='config_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text="Bumped whenever this config or the user's profile is saved"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def import_blocked_post_ids(apps, schema_editor):
+    """Copy every config's newline-separated blocked_post_ids into BlockedPost rows."""
+    AIAgentConfig = apps.get_model('accounts', 'AIAgentConfig')
+    BlockedPost = apps.get_model('accounts', 'BlockedPost')
+    configs = AIAgentConfig.objects.exclude(blocked_post_ids='').values_list('pk', 'blocked_post_ids')
+    batch = []
+    for config_id, text in configs.iterator(chunk_size=BATCH_SIZE):
+        post_ids = dict.fromkeys(pid.strip() for pid in text.split('\n') if pid.strip())
+        batch.extend(BlockedPost(config_id=config_id, post_id=post_id) for post_id in post_ids)
+        if len(batch) >= BATCH_SIZE:
+            BlockedPost.objects.bulk_create(batch, batch_size=BATCH_SIZE, ignore_conflicts=True)
+            batch = []
+    if batch:
+        BlockedPost.objects.bulk_create(batch, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_aiagentconfig_config_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocked_posts', to='accounts.aiagentconfig')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('config', 'post_id'), name='unique_blocked_post')],
+            },
+        ),
+        migrations.RunPython(import_blocked_post_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_blockedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postjob',
+            name='available_at',
+            field=models.DateTimeField(blank=True, help_text='Not claimed before this time; set when the Graph rate limit defers the job', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledpost',
+            name='available_at',
+            field=models.DateTimeField(blank=True, help_text='Not published before this time; set when the Graph rate limit defers the post', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_postjob_available_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagetokenhealth',
+            name='token_fingerprint',
+            field=models.CharField(help_text='SHA-1 of the page ID and token that were checked', max_length=40),
+        ),
+    ]
@@ -30,6 +30,10 @@ class CustomUser(AbstractUser):
     """Custom user model with email as username"""
     username = None
     email = models.EmailField(unique=True)
+    email_prefix = models.CharField(
+        max_length=254, unique=True, null=True, blank=True, editable=False,
+        help_text='Part of the email before @, kept in sync on save; empty if an older account already uses it'
+    )
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -39,6 +43,16 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
     
+    def save(self, *args, **kwargs):
+        prefix = self.get_email_prefix()
+        if self.email_prefix != prefix:
+            # A prefix belongs to the first account that claimed it
+            taken = CustomUser.objects.filter(email_prefix=prefix).exclude(pk=self.pk).exists()
+            self.email_prefix = None if taken else prefix
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'email_prefix'}
+        super().save(*args, **kwargs)
+    
     def get_email_prefix(self):
         """Get the part of email before @ symbol"""
         return self.email.split('@')[0] if '@' in self.email else self.email
@@ -95,15 +109,37 @@ class AIAgentConfig(models.Model):
     system_prompt = models.TextField(blank=True)
     google_sheet_id = models.CharField(max_length=200, blank=True, help_text='Google Sheet ID for reports')
     blocked_post_ids = models.TextField(blank=True, help_text='Newline-separated list of Facebook post IDs to block')
+    config_version = models.PositiveBigIntegerField(default=0, editable=False, help_text='Bumped whenever this config or the user\'s profile is saved')
     
     def __str__(self):
         return f"{self.user.email}'s AI config"
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # config_version only moves through bump_config_version(); a stale copy must not write it back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'config_version'
+            ]
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def bump_config_version(cls, user_id):
+        """Atomically move the user's config to a new version"""
+        cls.objects.filter(user_id=user_id).update(config_version=models.F('config_version') + 1)
+    
     def get_webhook_url(self):
         """Generate webhook URL based on user's email"""
         email_prefix = self.user.get_email_prefix()
         return f"https://ftn8nbd.onrender.com/webhook/{email_prefix}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save handler tell whether the blocked list was edited
+        instance._loaded_blocked_post_ids = instance.__dict__.get('blocked_post_ids')
+        return instance
+    
     def get_blocked_post_ids_list(self):
         """Return blocked post IDs as a list"""
         if not self.blocked_post_ids:
@@ -111,6 +147,134 @@ class AIAgentConfig(models.Model):
         return [pid.strip() for pid in self.blocked_post_ids.strip().split('\n') if pid.strip()]
 
 
+class BlockedPost(models.Model):
+    """One Facebook post ID from AIAgentConfig.blocked_post_ids, indexed for membership checks"""
+    config = models.ForeignKey(AIAgentConfig, on_delete=models.CASCADE, related_name='blocked_posts')
+    post_id = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.config.user.email} - blocked {self.post_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'post_id'], name='unique_blocked_post'),
+        ]
+
+
+class PageTokenHealth(models.Model):
+    """Cached result of Graph's debug_token for a config's page token"""
+    config = models.OneToOneField(AIAgentConfig, on_delete=models.CASCADE, related_name='token_health')
+    token_fingerprint = models.CharField(max_length=40, help_text='SHA-1 of the page ID and token that were checked')
+    is_valid = models.BooleanField(null=True, help_text='Unknown until the first check completes')
+    expires_at = models.DateTimeField(null=True, blank=True, help_text='Empty for tokens that never expire')
+    scopes = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.config.user.email}'s page token health"
+
+
+class ReportSheet(models.Model):
+    """Sync state of a user's Google Sheet report mirrored into ReportRow"""
+    config = models.OneToOneField(AIAgentConfig, on_delete=models.CASCADE, related_name='report_sheet')
+    sheet_id = models.CharField(max_length=200, blank=True)
+    columns = models.JSONField(default=list, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    content_digest = models.CharField(max_length=40, blank=True, help_text='SHA-1 of the last synced CSV export')
+    version = models.PositiveIntegerField(default=0, help_text='Bumped every time the stored rows change')
+    synced_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    last_viewed_at = models.DateTimeField(null=True, blank=True, help_text='Last time the user opened or polled the report')
+
+    def __str__(self):
+        return f"{self.config.user.email}'s report sheet"
+
+
+class ReportRow(models.Model):
+    """One data row of a user's report sheet, in sheet order"""
+    config = models.ForeignKey(AIAgentConfig, on_delete=models.CASCADE, related_name='report_rows')
+    row_index = models.PositiveIntegerField()
+    data = models.JSONField(default=list)
+    search_text = models.TextField(blank=True, help_text='Lower-cased cell values used for searching')
+
+    def __str__(self):
+        return f"{self.config.user.email} - row {self.row_index}"
+
+    class Meta:
+        ordering = ['-row_index']
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'row_index'], name='unique_report_row_index'),
+        ]
+
+
+class PostJob(models.Model):
+    """A post queued for publishing to the user's Facebook Page by process_post_jobs"""
+    STATUS_CHOICES = (
+        ('PENDING', 'Queued'),
+        ('RUNNING', 'Publishing'),
+        ('DONE', 'Published'),
+        ('FAILED', 'Failed'),
+    )
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='post_jobs')
+    message = models.TextField(blank=True)
+    image = models.FileField(upload_to='post_uploads/', blank=True, null=True, help_text='Spooled upload, removed once published')
+    image_content_type = models.CharField(max_length=100, blank=True)
+    original_size = models.PositiveIntegerField(null=True, blank=True, help_text='Bytes uploaded by the user')
+    upload_size = models.PositiveIntegerField(null=True, blank=True, help_text='Bytes sent to Facebook after processing')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(null=True, blank=True, help_text='Not claimed before this time; set when the Graph rate limit defers the job')
+    facebook_post_id = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.email} - post job {self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='postjob_status_created'),
+        ]
+
+
+class ScheduledPost(models.Model):
+    """A post to publish on the user's Facebook Page at publish_at, sent by dispatch_scheduled_posts"""
+    STATUS_CHOICES = (
+        ('SCHEDULED', 'Scheduled'),
+        ('PUBLISHING', 'Publishing'),
+        ('PUBLISHED', 'Published'),
+        ('FAILED', 'Failed'),
+        ('CANCELLED', 'Cancelled'),
+    )
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='scheduled_posts')
+    message = models.TextField(blank=True)
+    image = models.FileField(upload_to='post_uploads/scheduled/', blank=True, null=True)
+    image_content_type = models.CharField(max_length=100, blank=True)
+    publish_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='SCHEDULED')
+    available_at = models.DateTimeField(null=True, blank=True, help_text='Not published before this time; set when the Graph rate limit defers the post')
+    facebook_post_id = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.email} - post at {self.publish_at:%Y-%m-%d %H:%M} ({self.status})"
+
+    class Meta:
+        ordering = ['publish_at']
+        indexes = [
+            # The dispatcher only ever scans posts still waiting, in time order
+            models.Index(fields=['publish_at'], name='scheduledpost_due', condition=models.Q(status='SCHEDULED')),
+        ]
+
+
 class SubscriptionHistory(models.Model):
     """Track history of user subscription packages"""
     profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='subscription_history')
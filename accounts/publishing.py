@@ -0,0 +1,287 @@
+"""
+Queued publishing of Facebook Page posts.
+
+create_post_view only stores a PostJob, with the uploaded image spooled to
+MEDIA_ROOT/post_uploads/, and returns at once. The process_post_jobs worker
+claims queued jobs and publishes them. Photos are streamed from disk to the
+Graph API as a multipart body, so neither process holds the whole image in
+memory. Photos are downscaled and re-encoded first (see accounts/images.py)
+unless POST_IMAGE_PROCESSING is off.
+
+ScheduledPosts go through the same publish_to_page() when
+dispatch_scheduled_posts finds them due.
+
+A post refused by graph.GraphThrottled because the page is at its rate
+limit was never sent, so it is put back in the queue with available_at set
+to when the limit is expected to clear. That claim does not count as an
+attempt.
+"""
+from contextlib import ExitStack
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import graph, images
+from .feed import invalidate_feed
+from .models import AIAgentConfig, PostJob, ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# A job left RUNNING this long belongs to a worker that died mid-upload
+STALE_JOB_AFTER = timezone.timedelta(minutes=10)
+
+
+
+class MultipartStream:
+    """
+    File-like multipart/form-data body whose file part is read from disk in chunks.
+    requests sends it with a Content-Length taken from __len__.
+    """
+
+    def __init__(self, fields, file_field, filename, fileobj, content_type):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+
+        head = b''.join(self._field(name, value) for name, value in fields.items())
+        head += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{_quote(filename)}"\r\n'
+            f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+        fileobj.seek(0, os.SEEK_END)
+        file_size = fileobj.tell()
+        fileobj.seek(0)
+
+        self._parts = [head, fileobj, tail]
+        self._length = len(head) + file_size + len(tail)
+        self._buffer = b''
+
+    def _field(self, name, value):
+        return (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+            f'{value}\r\n'
+        ).encode()
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        while len(self._buffer) < size and self._parts:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                self._buffer += part
+                self._parts.pop(0)
+                continue
+            chunk = part.read(max(size - len(self._buffer), STREAM_CHUNK_SIZE))
+            if chunk:
+                self._buffer += chunk
+            else:
+                self._parts.pop(0)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _quote(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\r', '').replace('\n', '')
+
+
+def enqueue_post(user, message, image=None):
+    """Queue a post; the upload is written to storage in chunks, never read whole."""
+    job = PostJob(user=user, message=message)
+    if image:
+        job.image_content_type = image.content_type or ''
+        job.image.save(image.name, image, save=False)
+    job.save()
+    return job
+
+
+def claim_next_job():
+    """Atomically take the oldest queued job, or return None."""
+    now = timezone.now()
+    candidates = PostJob.objects.filter(
+        Q(available_at__isnull=True) | Q(available_at__lte=now), status='PENDING',
+    ).order_by('created_at').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        # Only one worker's update can flip PENDING -> RUNNING
+        claimed = PostJob.objects.filter(pk=pk, status='PENDING').update(
+            status='RUNNING', started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return PostJob.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def fail_stale_jobs():
+    """Fail jobs abandoned by a crashed worker rather than risk posting twice, removing their spooled images."""
+    now = timezone.now()
+    failed = 0
+    for job in PostJob.objects.filter(status='RUNNING', started_at__lt=now - STALE_JOB_AFTER).only('pk', 'image'):
+        # Skip jobs their worker finished after all since the query
+        if PostJob.objects.filter(pk=job.pk, status='RUNNING').update(
+            status='FAILED', error='Publishing was interrupted. Please try again.', finished_at=now, image=None,
+        ):
+            failed += 1
+            if job.image:
+                job.image.delete(save=False)
+    return failed
+
+
+def publish_to_page(user, message, image=None, content_type=''):
+    """
+    Publish a post with an optional stored image to the user's page
+    -> (facebook_post_id, original_size, upload_size). Raises ValueError on failure.
+    """
+    config = AIAgentConfig.objects.filter(user=user).first()
+    page_id = config.facebook_page_id if config else ''
+    access_token = config.facebook_page_api if config else ''
+    if not page_id or not access_token:
+        raise ValueError('Facebook Page ID or API key is missing. Please configure your AI Agent first.')
+
+    original_size = upload_size = None
+    if image:
+        with ExitStack() as stack:
+            upload = stack.enter_context(image.open('rb'))
+            filename = os.path.basename(image.name)
+            original_size = images.file_size(upload)
+
+            processed = images.prepare_upload(upload, original_size) if settings.POST_IMAGE_PROCESSING else None
+            if processed:
+                upload, content_type, extension = processed
+                stack.callback(upload.close)
+                filename = os.path.splitext(filename)[0] + extension
+            upload_size = images.file_size(upload)
+            if upload_size < original_size:
+                logger.info('Image %s: %d -> %d bytes', filename, original_size, upload_size)
+
+            fields = {'access_token': access_token}
+            if message:
+                fields['caption'] = message
+            body = MultipartStream(fields, 'source', filename, upload, content_type)
+            response = graph.post(f'{page_id}/photos', data=body, headers={'Content-Type': body.content_type})
+    else:
+        response = graph.post(f'{page_id}/feed', data={'message': message, 'access_token': access_token})
+
+    data = response.json()
+    if response.status_code != 200:
+        raise ValueError(data.get('error', {}).get('message', 'Unknown error'))
+
+    invalidate_feed(page_id)
+    return data.get('post_id') or data.get('id', ''), original_size, upload_size
+
+
+def _retry_at(throttled):
+    return timezone.now() + timezone.timedelta(seconds=max(1, throttled.wait))
+
+
+def publish_job(job):
+    """Publish a claimed job to Facebook and record the outcome."""
+    try:
+        job.facebook_post_id, job.original_size, job.upload_size = publish_to_page(
+            job.user, job.message, job.image, job.image_content_type
+        )
+        job.status = 'DONE'
+        job.error = ''
+    except graph.GraphThrottled as e:
+        # Nothing was sent, so this claim is not counted as an attempt
+        logger.info('Post job %s deferred: %s', job.pk, e)
+        job.status = 'PENDING'
+        job.attempts -= 1
+        job.available_at = _retry_at(e)
+        job.error = str(e)
+        job.save(update_fields=['status', 'attempts', 'available_at', 'error'])
+        return job
+    except Exception as e:
+        logger.warning('Post job %s failed: %s', job.pk, e)
+        job.status = 'FAILED'
+        job.error = str(e)
+
+    if job.image:
+        job.image.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'facebook_post_id', 'error', 'image', 'original_size', 'upload_size', 'finished_at',
+    ])
+    return job
+
+
+def schedule_post(user, message, publish_at, image=None):
+    """Store a post to be published at publish_at."""
+    post = ScheduledPost(user=user, message=message, publish_at=publish_at)
+    if image:
+        post.image_content_type = image.content_type or ''
+        post.image.save(image.name, image, save=False)
+    post.save()
+    return post
+
+
+def claim_due_posts(limit):
+    """Atomically take up to limit scheduled posts whose time has come, oldest first."""
+    now = timezone.now()
+    due = ScheduledPost.objects.filter(
+        Q(available_at__isnull=True) | Q(available_at__lte=now), status='SCHEDULED', publish_at__lte=now,
+    ).order_by('publish_at')
+    claimed = []
+    for pk in due.values_list('pk', flat=True)[:limit]:
+        # Another dispatcher may have taken it in the meantime
+        if ScheduledPost.objects.filter(pk=pk, status='SCHEDULED').update(status='PUBLISHING', claimed_at=now):
+            claimed.append(pk)
+    return list(ScheduledPost.objects.filter(pk__in=claimed).select_related('user').order_by('publish_at'))
+
+
+def fail_stale_scheduled_posts():
+    """Fail posts abandoned mid-publish by a crashed dispatcher rather than risk posting twice, removing their images."""
+    stale = ScheduledPost.objects.filter(status='PUBLISHING', claimed_at__lt=timezone.now() - STALE_JOB_AFTER)
+    failed = 0
+    for post in stale.only('pk', 'image'):
+        # Skip posts their dispatcher finished after all since the query
+        if ScheduledPost.objects.filter(pk=post.pk, status='PUBLISHING').update(
+            status='FAILED', error='Publishing was interrupted.', image=None,
+        ):
+            failed += 1
+            if post.image:
+                post.image.delete(save=False)
+    return failed
+
+
+def publish_scheduled_post(post):
+    """Publish a claimed scheduled post and record the outcome."""
+    try:
+        post.facebook_post_id, _, _ = publish_to_page(post.user, post.message, post.image, post.image_content_type)
+        post.status = 'PUBLISHED'
+        post.error = ''
+        post.published_at = timezone.now()
+    except graph.GraphThrottled as e:
+        logger.info('Scheduled post %s deferred: %s', post.pk, e)
+        post.status = 'SCHEDULED'
+        post.claimed_at = None
+        post.available_at = _retry_at(e)
+        post.error = str(e)
+        post.save(update_fields=['status', 'claimed_at', 'available_at', 'error'])
+        return post
+    except Exception as e:
+        logger.warning('Scheduled post %s failed: %s', post.pk, e)
+        post.status = 'FAILED'
+        post.error = str(e)
+
+    if post.image:
+        post.image.delete(save=False)
+    post.save(update_fields=['status', 'facebook_post_id', 'error', 'image', 'published_at'])
+    return post
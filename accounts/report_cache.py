@@ -0,0 +1,192 @@
+"""
+Shared snapshot cache for Google Sheet reports.
+
+The report page and its 30 second poller both need the same sheet. Each
+sheet is downloaded and parsed once per TTL, then kept in a per-process LRU
+cache bounded by REPORT_CACHE_MAX_BYTES, from which report_sync copies new
+rows into the database.
+
+Behind the LRU sits report_store: parsed snapshots are written to disk as
+memory-mapped columnar files, so a restarted worker reuses a fresh one and an
+unchanged export is never parsed twice.
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+import requests
+
+from . import report_store
+from .report_engine import parse_csv
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SHEET_EXPORT_URL = 'https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv'
+
+
+class SheetSnapshot:
+    """Parsed contents of one sheet export, rows kept in sheet order."""
+
+    def __init__(self, sheet_id, columns, rows, digest):
+        self.sheet_id = sheet_id
+        self.columns = columns
+        self.rows = rows
+        self.digest = digest
+        self.fetched_at = time.time()
+        self.nbytes = _estimate_size(columns, rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def read_rows(self, start=0, stop=None, columns=None):
+        """Rows [start, stop), optionally limited to some column indexes."""
+        rows = self.rows[start:stop]
+        if columns is None:
+            return rows
+        return [tuple(row[i] for i in columns) for row in rows]
+
+
+def _estimate_size(columns, rows):
+    """Rough resident size of a snapshot, used for the memory budget."""
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(col) for col in columns)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for cell in row:
+            size += sys.getsizeof(cell)
+    return size
+
+
+class SnapshotCache:
+    """Thread-safe LRU cache of sheet snapshots with a TTL and a byte budget."""
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, sheet_id):
+        with self._lock:
+            snapshot = self._entries.get(sheet_id)
+            if snapshot is None or snapshot.age() > self.ttl:
+                if snapshot is not None:
+                    self._remove(sheet_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sheet_id)
+            self.hits += 1
+            return snapshot
+
+    def put(self, snapshot):
+        with self._lock:
+            if snapshot.sheet_id in self._entries:
+                self._remove(snapshot.sheet_id)
+            if snapshot.nbytes > self.max_bytes:
+                # Too big to keep around; the caller still gets to use it once.
+                return
+            self._entries[snapshot.sheet_id] = snapshot
+            self._bytes += snapshot.nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, sheet_id):
+        with self._lock:
+            if sheet_id in self._entries:
+                self._remove(sheet_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _remove(self, sheet_id):
+        snapshot = self._entries.pop(sheet_id)
+        self._bytes -= snapshot.nbytes
+
+
+snapshot_cache = SnapshotCache(
+    ttl=settings.REPORT_CACHE_TTL,
+    max_bytes=settings.REPORT_CACHE_MAX_BYTES,
+)
+
+# Threads polling the same sheet share one download
+sheet_fetches = SingleFlight(wait_timeout=settings.REPORT_FETCH_WAIT_TIMEOUT)
+
+
+def fetch_snapshot(sheet_id):
+    """
+    Download the sheet as CSV and return it as a snapshot.
+    An export already stored on disk under the same digest is not parsed again.
+    """
+    url = SHEET_EXPORT_URL.format(sheet_id=sheet_id)
+    response = requests.get(
+        url, timeout=(settings.REPORT_FETCH_CONNECT_TIMEOUT, settings.REPORT_FETCH_READ_TIMEOUT)
+    )
+    response.raise_for_status()
+
+    digest = hashlib.sha1(response.content).hexdigest()
+    stored = report_store.load(sheet_id, digest=digest)
+    if stored is not None:
+        report_store.touch(stored)
+        return stored
+
+    columns, rows = parse_csv(response.content)
+    snapshot = SheetSnapshot(sheet_id, columns, rows, digest)
+    try:
+        return report_store.save(snapshot)
+    except OSError as e:
+        logger.warning('Could not store report snapshot for %s: %s', sheet_id, e)
+        return snapshot
+
+
+def get_snapshot(sheet_id, force=False):
+    """Return a fresh snapshot for the sheet, downloading it only on a miss."""
+    if not force:
+        snapshot = snapshot_cache.get(sheet_id)
+        if snapshot is not None:
+            return snapshot
+
+    return sheet_fetches.do((sheet_id, force), _fetch_and_store, sheet_id, force)
+
+
+def _fetch_and_store(sheet_id, force=False):
+    # A worker that restarted within the TTL picks up the snapshot from disk
+    snapshot = None if force else report_store.load(sheet_id, max_age=settings.REPORT_CACHE_TTL)
+    if snapshot is None:
+        snapshot = fetch_snapshot(sheet_id)
+        logger.debug('Fetched report sheet %s (%d rows)', sheet_id, len(snapshot))
+    snapshot_cache.put(snapshot)
+    return snapshot
+
+
+def invalidate(sheet_id):
+    """Drop the cached snapshot for a sheet, e.g. after its ID was replaced."""
+    if sheet_id:
+        snapshot_cache.invalidate(sheet_id)
+
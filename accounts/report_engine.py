@@ -0,0 +1,50 @@
+"""
+Lightweight report engine built on the stdlib csv module.
+
+The report path only needs to parse a Google Sheet CSV export into a header
+and rows of text. Doing that without pandas keeps it out of every worker's
+import time and resident memory. Rows are compact tuples of str, and
+repeated cell values (page names, statuses, ...) share one string object.
+"""
+import csv
+import io
+
+
+def _column_names(header):
+    """Name blank and duplicate headers the way pandas did ("Unnamed: 2", "Name.1")."""
+    names = []
+    seen = {}
+    for index, name in enumerate(header):
+        name = name.strip() or f'Unnamed: {index}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def parse_csv(content):
+    """
+    Parse CSV bytes into (columns, rows).
+    Blank lines are skipped and every row is padded or cut to the header width.
+    """
+    reader = csv.reader(io.StringIO(content.decode('utf-8-sig')))
+    header = next(reader, None)
+    if header is None:
+        return [], []
+
+    columns = _column_names(header)
+    width = len(columns)
+    strings = {}
+    rows = []
+
+    for record in reader:
+        if not any(record):
+            continue
+        if len(record) < width:
+            record.extend([''] * (width - len(record)))
+        rows.append(tuple(strings.setdefault(cell, cell) for cell in record[:width]))
+
+    return columns, rows
@@ -0,0 +1,116 @@
+"""
+Streaming exports of report rows as Excel, CSV or JSON Lines.
+
+Rows are read from the database in chunks and written straight to the
+response (CSV/JSONL) or to an openpyxl write-only workbook spooled to a
+temporary file (Excel). Peak memory therefore stays flat however large the
+sheet is.
+
+The site runs on Uvicorn (ASGI) workers, where Django drains a synchronous
+response iterator into a list before sending anything. Every export is
+therefore streamed from an async iterator; under runserver/WSGI Django
+does the reverse and buffers these instead.
+"""
+import csv
+import json
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+EXPORT_CHUNK_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the value back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _iter_rows(queryset):
+    return queryset.values_list('data', flat=True).aiterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+async def _chunked(lines):
+    """Join generated lines into response chunks of EXPORT_CHUNK_SIZE rows."""
+    chunk = []
+    async for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+async def _csv_lines(queryset, columns):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM so Excel opens UTF-8 (e.g. Bangla) text correctly
+    yield writer.writerow(columns)
+    async for row in _iter_rows(queryset):
+        yield writer.writerow(row)
+
+
+async def _jsonl_lines(queryset, columns):
+    async for row in _iter_rows(queryset):
+        yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+
+
+def _excel_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def _xlsx_file(queryset, columns):
+    """Write the rows to a temporary .xlsx file and rewind it."""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Report')
+    worksheet.append(columns)
+    for row in queryset.values_list('data', flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        worksheet.append([_excel_value(value) for value in row])
+
+    spool = tempfile.TemporaryFile()
+    workbook.save(spool)
+    spool.seek(0)
+    return spool
+
+
+async def _read_file(spool):
+    """Yield a spooled file in FILE_CHUNK_SIZE pieces, closing it at the end."""
+    read = sync_to_async(spool.read, thread_sensitive=False)
+    try:
+        while chunk := await read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        spool.close()
+
+
+def export_response(queryset, columns, fmt='xlsx'):
+    """Build a download response for a ReportRow queryset in the given format."""
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'xlsx'
+    filename = f'report.{fmt}'
+    content_type = EXPORT_FORMATS[fmt]
+
+    if fmt == 'xlsx':
+        spool = _xlsx_file(queryset, columns)
+        size = spool.seek(0, 2)
+        spool.seek(0)
+        response = StreamingHttpResponse(_read_file(spool), content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        lines = _csv_lines(queryset, columns) if fmt == 'csv' else _jsonl_lines(queryset, columns)
+        response = StreamingHttpResponse(_chunked(lines), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
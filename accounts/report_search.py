@@ -0,0 +1,127 @@
+"""
+Full-text search over synced report rows.
+
+SQLite uses an FTS5 table (accounts_reportrow_fts) kept in step with
+accounts_reportrow by triggers. PostgreSQL uses a GIN tsvector index and a
+pg_trgm index on search_text. Both are created by migration 0012; any other
+backend falls back to substring matching. The index only picks candidate
+rows; each term must then also appear in the row as a substring, which keeps
+results exact where the tokenizers split words (e.g. Bangla vowel signs).
+On PostgreSQL the terms are split into lexemes by the same 'simple' parser
+that built the index, so emails and URLs stay whole, as in the rows.
+
+Query syntax: whitespace-separated terms must all be present. `column:value`
+(or `"Column Name":value`) also restricts the value to that column.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .models import ReportRow
+
+FTS_TABLE = 'accounts_reportrow_fts'
+
+PART_RE = re.compile(r'(?:"[^"]*"|[^\s":]+):(?:"[^"]*"|\S*)|"[^"]*"|\S+')
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts_available = None
+
+
+def _sqlite_fts_available():
+    """Whether the FTS5 table exists (it may not if SQLite lacks FTS5)."""
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def _unquote(text):
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1]
+    return text
+
+
+def parse_query(query, columns):
+    """
+    Split a search query into free terms and per-column filters.
+    Returns (terms, column_filters) where column_filters is a list of
+    (column_index, value) pairs.
+    """
+    lowered_columns = [str(col).lower() for col in columns]
+    terms = []
+    column_filters = []
+
+    for part in PART_RE.findall(query):
+        if ':' in part:
+            if part.startswith('"'):
+                name, _, value = part[1:].partition('":')
+            else:
+                name, _, value = part.partition(':')
+            name = name.strip().lower()
+            value = _unquote(value).strip()
+            if name in lowered_columns and value:
+                column_filters.append((lowered_columns.index(name), value))
+                continue
+        part = _unquote(part).strip()
+        if part:
+            terms.append(part)
+
+    return terms, column_filters
+
+
+def _words(texts):
+    words = []
+    for text in texts:
+        words.extend(word.lower() for word in WORD_RE.findall(text))
+    return words
+
+
+def _pg_lexemes(texts):
+    """Lexemes PostgreSQL's 'simple' configuration makes of the texts, as in the tsvector index."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT tsvector_to_array(to_tsvector('simple', %s))", [' '.join(texts)])
+        return cursor.fetchone()[0]
+
+
+def _tsquery_prefix(lexeme):
+    # Quoted, so the lexeme is taken as is rather than parsed as tsquery syntax
+    return "'" + lexeme.replace('\\', '\\\\').replace("'", "''") + "':*"
+
+
+def search_rows(config, columns, query):
+    """The config's ReportRows matching the query, as a queryset."""
+    queryset = ReportRow.objects.filter(config=config)
+    terms, column_filters = parse_query(query, columns)
+    texts = terms + [value for _, value in column_filters]
+    words = _words(texts)
+
+    if words and connection.vendor == 'sqlite' and _sqlite_fts_available():
+        match = ' '.join(f'"{word}"*' for word in words)
+        # Joined to the config's rows inside the subquery, so other users' matches never leave it
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT fts.rowid FROM {FTS_TABLE} AS fts'
+            f' JOIN accounts_reportrow AS r ON r.id = fts.rowid'
+            f' WHERE fts.{FTS_TABLE} MATCH %s AND r.config_id = %s', [match, config.pk]
+        ))
+    elif words and connection.vendor == 'postgresql':
+        lexemes = _pg_lexemes(texts)
+        if lexemes:
+            queryset = queryset.filter(RawSQL(
+                "to_tsvector('simple', accounts_reportrow.search_text) @@ to_tsquery('simple', %s)",
+                [' & '.join(_tsquery_prefix(lexeme) for lexeme in lexemes)], output_field=BooleanField(),
+            ))
+
+    # Tokenizers split Bangla words at dependent vowel signs ("কমেন্ট" would
+    # match "কম"), so every term must still be in the row as typed
+    for term in terms:
+        queryset = queryset.filter(search_text__contains=term.lower())
+
+    for column_index, value in column_filters:
+        queryset = queryset.filter(**{f'data__{column_index}__icontains': value})
+
+    return queryset
+
@@ -0,0 +1,246 @@
+"""
+On-disk columnar snapshots of parsed report sheets.
+
+Each parsed sheet export is written once to REPORT_SNAPSHOT_DIR as a simple
+columnar file. Every column is an array of uint64 end offsets followed by
+its UTF-8 cell data, and a JSON footer describes the layout. Files are
+memory-mapped when read, so:
+
+- a worker restart does not force a re-download within REPORT_CACHE_TTL,
+- an export whose content digest is already on disk is not parsed again,
+- callers only touch the columns and row range they ask for.
+
+File names carry the sheet key, the content digest and the format version.
+cleanup() removes old versions, files older than REPORT_SNAPSHOT_MAX_AGE and,
+oldest first, anything over REPORT_SNAPSHOT_MAX_BYTES.
+"""
+from array import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MAGIC = b'PPSNAP01'
+TRAILER = struct.Struct('<Q8s')  # footer length, magic
+SUFFIX = f'.v{FORMAT_VERSION}.snap'
+CLEANUP_EVERY = 60  # seconds between directory sweeps per process
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0
+
+
+def _sheet_key(sheet_id):
+    return hashlib.sha1(sheet_id.encode()).hexdigest()[:20]
+
+
+def _path(sheet_id, digest):
+    return os.path.join(settings.REPORT_SNAPSHOT_DIR, f'{_sheet_key(sheet_id)}-{digest[:16]}{SUFFIX}')
+
+
+class MappedSnapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer_len, magic = TRAILER.unpack_from(self._mm, len(self._mm) - TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a report snapshot')
+        footer_start = len(self._mm) - TRAILER.size - footer_len
+        footer = json.loads(self._mm[footer_start:footer_start + footer_len])
+        if footer['format'] != FORMAT_VERSION or footer['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was written in an incompatible format')
+
+        self.path = path
+        self.sheet_id = footer['sheet_id']
+        self.digest = footer['digest']
+        self.columns = footer['columns']
+        self._row_count = footer['rows']
+        self._blocks = footer['blocks']
+        self.fetched_at = os.path.getmtime(path)
+        # Pages live in the OS page cache; only the bookkeeping counts against the budget
+        self.nbytes = sys.getsizeof(footer) + 64 * len(self.columns)
+
+    def __len__(self):
+        return self._row_count
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def read_rows(self, start=0, stop=None, columns=None):
+        """Rows [start, stop) as tuples of str, optionally limited to some column indexes."""
+        stop = self._row_count if stop is None else min(stop, self._row_count)
+        start = max(0, min(start, stop))
+        indexes = range(len(self.columns)) if columns is None else columns
+
+        cells = []
+        view = memoryview(self._mm)
+        for index in indexes:
+            offsets_at, data_at = self._blocks[index]
+            offsets = view[offsets_at + start * 8:offsets_at + (stop + 1) * 8].cast('Q')
+            cells.append([
+                str(view[data_at + offsets[i]:data_at + offsets[i + 1]], 'utf-8')
+                for i in range(stop - start)
+            ])
+            offsets.release()
+        view.release()
+        return list(zip(*cells)) if cells else [() for _ in range(stop - start)]
+
+    @property
+    def rows(self):
+        return self.read_rows()
+
+
+def save(snapshot):
+    """Write a parsed snapshot to disk and return it memory-mapped."""
+    os.makedirs(settings.REPORT_SNAPSHOT_DIR, exist_ok=True)
+    path = _path(snapshot.sheet_id, snapshot.digest)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    blocks = []
+    with open(tmp_path, 'wb') as f:
+        for index in range(len(snapshot.columns)):
+            encoded = [str(row[index]).encode('utf-8') for row in snapshot.rows]
+            offsets = array('Q', [0])
+            for cell in encoded:
+                offsets.append(offsets[-1] + len(cell))
+            offsets_at = f.tell()
+            offsets.tofile(f)
+            blocks.append([offsets_at, f.tell()])
+            f.write(b''.join(encoded))
+
+        footer = json.dumps({
+            'format': FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'sheet_id': snapshot.sheet_id,
+            'digest': snapshot.digest,
+            'columns': snapshot.columns,
+            'rows': len(snapshot),
+            'blocks': blocks,
+        }).encode('utf-8')
+        f.write(footer)
+        f.write(TRAILER.pack(len(footer), MAGIC))
+
+    os.replace(tmp_path, path)
+    cleanup_if_due()
+    return MappedSnapshot(path)
+
+
+def load(sheet_id, digest=None, max_age=None):
+    """
+    Open the newest snapshot of a sheet (or the one with the given digest).
+    Returns None when there is none, it is older than max_age or unreadable.
+    """
+    directory = settings.REPORT_SNAPSHOT_DIR
+    if digest is not None:
+        candidates = [_path(sheet_id, digest)]
+    else:
+        prefix = f'{_sheet_key(sheet_id)}-'
+        try:
+            names = [n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith(SUFFIX)]
+        except FileNotFoundError:
+            return None
+        candidates = sorted(
+            (os.path.join(directory, n) for n in names), key=_mtime, reverse=True
+        )[:1]
+
+    for path in candidates:
+        if not os.path.exists(path):
+            continue
+        if max_age is not None and time.time() - _mtime(path) > max_age:
+            continue
+        try:
+            snapshot = MappedSnapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning('Discarding unreadable report snapshot %s: %s', path, e)
+            _remove(path)
+            continue
+        if snapshot.sheet_id == sheet_id:
+            return snapshot
+    return None
+
+
+def touch(snapshot):
+    """Mark a reused snapshot as freshly fetched."""
+    os.utime(snapshot.path)
+    snapshot.fetched_at = time.time()
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def cleanup(max_age=None, max_bytes=None):
+    """Delete stale, superseded and excess snapshot files. Returns the number removed."""
+    max_age = settings.REPORT_SNAPSHOT_MAX_AGE if max_age is None else max_age
+    max_bytes = settings.REPORT_SNAPSHOT_MAX_BYTES if max_bytes is None else max_bytes
+    directory = settings.REPORT_SNAPSHOT_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+
+    now = time.time()
+    removed = 0
+    newest_per_sheet = {}
+    files = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        is_tmp = name.endswith('.tmp')
+        if (not is_tmp and not name.endswith(SUFFIX)) or now - stat.st_mtime > max_age:
+            # Other format versions, and anything (including crashed writes) past max_age
+            _remove(path)
+            removed += 1
+            continue
+        if is_tmp:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        key = name.split('-', 1)[0]
+        if key not in newest_per_sheet or stat.st_mtime > newest_per_sheet[key][0]:
+            newest_per_sheet[key] = (stat.st_mtime, path)
+
+    keep = {path for _, path in newest_per_sheet.values()}
+    total = 0
+    for mtime, size, path in sorted(files, reverse=True):
+        if path not in keep or total + size > max_bytes:
+            _remove(path)
+            removed += 1
+        else:
+            total += size
+    return removed
+
+
+def cleanup_if_due():
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.time() - _last_cleanup < CLEANUP_EVERY:
+            return
+        _last_cleanup = time.time()
+    try:
+        cleanup()
+    except OSError as e:
+        logger.warning('Report snapshot cleanup failed: %s', e)
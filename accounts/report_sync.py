@@ -0,0 +1,106 @@
+"""
+Incremental sync of Google Sheet reports into the ReportRow table.
+
+Report sheets are append-only, so each refresh only inserts the rows past
+the last synced one. A full rebuild happens when the sheet ID, the header or
+an already synced row changes. The report views then search, reverse and
+paginate with plain indexed queries.
+"""
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import report_cache
+from .models import ReportRow, ReportSheet
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+
+# How often a report view is written back, for the prefetch scheduler
+VIEW_MARK_INTERVAL = timedelta(minutes=5)
+
+
+def build_search_text(row):
+    """Lower-cased text of all cells, one cell per line."""
+    return '\n'.join(str(cell) for cell in row).lower()
+
+
+def _is_append(sheet, snapshot, config):
+    """True when the snapshot only adds rows after the ones already stored."""
+    if sheet.sheet_id != snapshot.sheet_id or sheet.columns != snapshot.columns:
+        return False
+    if sheet.row_count == 0:
+        return True
+    if sheet.row_count > len(snapshot):
+        return False
+    last_row = ReportRow.objects.filter(
+        config=config, row_index=sheet.row_count - 1
+    ).values_list('data', flat=True).first()
+    return last_row == list(snapshot.read_rows(sheet.row_count - 1, sheet.row_count)[0])
+
+
+def sync_report(config, force=False):
+    """
+    Bring the config's ReportRow table up to date with its Google Sheet.
+    The sheet is only downloaded when the last sync is older than
+    REPORT_CACHE_TTL, unless force is set.
+    """
+    sheet, _ = ReportSheet.objects.get_or_create(config=config)
+    sheet_id = config.google_sheet_id
+    now = timezone.now()
+
+    if (not force and sheet.sheet_id == sheet_id and sheet.synced_at
+            and (now - sheet.synced_at).total_seconds() < settings.REPORT_CACHE_TTL):
+        return sheet
+
+    snapshot = report_cache.get_snapshot(sheet_id, force=force)
+
+    with transaction.atomic():
+        # Serialise concurrent syncs of the same report
+        sheet = ReportSheet.objects.select_for_update().get(pk=sheet.pk)
+
+        if sheet.sheet_id == sheet_id and sheet.content_digest == snapshot.digest:
+            sheet.synced_at = now
+            sheet.save(update_fields=['synced_at'])
+            return sheet
+
+        if _is_append(sheet, snapshot, config):
+            start = sheet.row_count
+        else:
+            ReportRow.objects.filter(config=config).delete()
+            start = 0
+
+        # Read the tail in batches so a large rebuild never holds every row at once
+        for batch_start in range(start, len(snapshot), BULK_BATCH_SIZE):
+            batch = snapshot.read_rows(batch_start, batch_start + BULK_BATCH_SIZE)
+            ReportRow.objects.bulk_create([
+                ReportRow(config=config, row_index=index, data=list(row), search_text=build_search_text(row))
+                for index, row in enumerate(batch, start=batch_start)
+            ], ignore_conflicts=True)
+
+        sheet.sheet_id = sheet_id
+        sheet.columns = snapshot.columns
+        sheet.row_count = len(snapshot)
+        sheet.content_digest = snapshot.digest
+        sheet.version += 1
+        sheet.synced_at = now
+        sheet.updated_at = now
+        sheet.save(update_fields=[
+            'sheet_id', 'columns', 'row_count', 'content_digest', 'version', 'synced_at', 'updated_at',
+        ])
+
+    logger.info('Synced report %s for %s: %s %d row(s)', sheet_id, config.user.email,
+                'appended' if start else 'loaded', len(snapshot) - start)
+    return sheet
+
+
+def mark_viewed(sheet):
+    """Record that the user is looking at the report, at most once per VIEW_MARK_INTERVAL."""
+    now = timezone.now()
+    if sheet.last_viewed_at is None or now - sheet.last_viewed_at > VIEW_MARK_INTERVAL:
+        ReportSheet.objects.filter(pk=sheet.pk).update(last_viewed_at=now)
+        sheet.last_viewed_at = now
@@ -0,0 +1,84 @@
+"""
+Model signal handlers for the accounts app, connected in AccountsConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blocked_posts, config_snapshots
+from .models import AIAgentConfig, CustomUser, PageTokenHealth, UserProfile
+from .token_health import fingerprint, revalidate_in_background
+
+
+@receiver(post_save, sender=AIAgentConfig)
+def revalidate_page_token(sender, instance, raw=False, **kwargs):
+    """Check a newly saved page token, or the token against a newly saved page, once the save is committed."""
+    if raw:
+        return
+    token = instance.facebook_page_api
+    if not token:
+        PageTokenHealth.objects.filter(config=instance).delete()
+        return
+    if PageTokenHealth.objects.filter(config=instance, token_fingerprint=fingerprint(instance)).exists():
+        return
+    config_id = instance.pk
+    transaction.on_commit(lambda: revalidate_in_background(config_id))
+
+
+@receiver(post_save, sender=AIAgentConfig)
+def sync_blocked_posts(sender, instance, created=False, raw=False, **kwargs):
+    """Mirror an edited blocked_post_ids text into BlockedPost rows."""
+    if raw:
+        return
+    if created or instance.blocked_post_ids != getattr(instance, '_loaded_blocked_post_ids', None):
+        blocked_posts.sync(instance)
+        instance._loaded_blocked_post_ids = instance.blocked_post_ids
+
+
+def _rebuild_snapshot(email_prefix):
+    # After commit, so the snapshot never holds data that was rolled back
+    transaction.on_commit(lambda: config_snapshots.rebuild(email_prefix))
+
+
+@receiver(post_save, sender=AIAgentConfig)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=AIAgentConfig)
+@receiver(post_delete, sender=UserProfile)
+def rebuild_config_snapshot(sender, instance, raw=False, **kwargs):
+    """Move the user's config to a new version and rebuild its API snapshot."""
+    if raw:
+        return
+    AIAgentConfig.bump_config_version(instance.user_id)
+    try:
+        user = instance.user
+    except CustomUser.DoesNotExist:
+        return
+    _rebuild_snapshot(user.get_email_prefix())
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_email_prefix(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the stored email prefix so a changed email also refreshes the old snapshot."""
+    instance._stored_email_prefix = None
+    if raw or not instance.pk or (update_fields is not None and 'email' not in update_fields):
+        return
+    email = CustomUser.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+    if email:
+        instance._stored_email_prefix = email.split('@')[0]
+
+
+@receiver(post_save, sender=CustomUser)
+def rebuild_user_snapshot(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Rebuild the API snapshot of a saved user; saves that leave the email alone, like logins, are skipped."""
+    if raw or (update_fields is not None and 'email' not in update_fields):
+        return
+    old_prefix = getattr(instance, '_stored_email_prefix', None)
+    if old_prefix and old_prefix != instance.get_email_prefix():
+        AIAgentConfig.bump_config_version(instance.pk)
+        _rebuild_snapshot(old_prefix)
+    _rebuild_snapshot(instance.get_email_prefix())
+
+
+@receiver(post_delete, sender=CustomUser)
+def drop_user_snapshot(sender, instance, **kwargs):
+    _rebuild_snapshot(instance.get_email_prefix())
@@ -0,0 +1,58 @@
+"""
+Single-flight coalescing of concurrent outbound fetches.
+
+When several threads ask for the same key at once (e.g. two tabs polling the
+same report sheet), only the first one runs the fetch. The others wait for it
+and share its result, or its exception. A follower waits at most
+wait_timeout seconds and then raises SingleFlightTimeout, so one hung fetch
+cannot pin every thread asking for the same key.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A follower gave up waiting for the call it shares."""
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, sharing its outcome."""
+
+    def __init__(self, wait_timeout=None):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                raise SingleFlightTimeout('This is taking too long to load. Please try again in a moment.')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -1,3 +1,276 @@
-from django.test import TestCase
+from hashlib import sha1
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from . import report_store
+from .models import AIAgentConfig, CustomUser, PostJob, ReportRow, ScheduledPost
+from .publishing import claim_due_posts, claim_next_job
+from .report_cache import SheetSnapshot, fetch_snapshot
+from .report_search import search_rows
+from .views import _parse_publish_at
+from .report_sync import sync_report
+
+COLUMNS = ['Name', 'Email', 'Link']
+
+
+class ReportSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.config = cls._config('joy@example.com', [
+            ['John', 'john@gmail.com', 'https://example.com/shop/item-7'],
+            ['Jane', 'jane@yahoo.com', 'https://example.org/'],
+            ['রহিম', 'কম দাম নতুন টাকা', ''],
+            ['করিম', 'কমেন্ট দিন', ''],
+        ])
+        cls.other_config = cls._config('other@example.com', [
+            ['John', 'john@gmail.com', 'https://example.com/shop/item-7'],
+        ])
+
+    @staticmethod
+    def _config(email, rows):
+        config = AIAgentConfig.objects.create(user=CustomUser.objects.create_user(email, 'pw'))
+        ReportRow.objects.bulk_create([
+            ReportRow(config=config, row_index=i, data=row, search_text=' '.join(row).lower())
+            for i, row in enumerate(rows)
+        ])
+        return config
+
+    def _names(self, query, config=None):
+        rows = search_rows(config or self.config, COLUMNS, query)
+        return sorted(data[0] for data in rows.values_list('data', flat=True))
+
+    def test_terms_are_prefix_matched(self):
+        self.assertEqual(self._names('jo'), ['John'])
+        self.assertEqual(self._names('ja yah'), ['Jane'])
+
+    def test_only_the_configs_rows_are_searched(self):
+        self.assertEqual(self._names('john'), ['John'])
+        self.assertEqual(self._names('jane', self.other_config), [])
+
+    def test_bangla_terms_match_whole(self):
+        # \w and the FTS tokenizer split "কমেন্ট" at its vowel signs into pieces found in other rows
+        self.assertEqual(self._names('কমেন্ট'), ['করিম'])
+        self.assertEqual(self._names('কম'), ['করিম', 'রহিম'])
+
+    def test_column_filter(self):
+        self.assertEqual(self._names('Email:yahoo'), ['Jane'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL text search')
+    def test_emails_and_urls_match_as_whole_lexemes(self):
+        # The 'simple' parser keeps these whole in the index, so the query must too
+        self.assertEqual(self._names('john@gmail.com'), ['John'])
+        self.assertEqual(self._names('example.com/shop'), ['John'])
+        self.assertEqual(self._names("o'brien"), [])
+
+
+class ReportSyncTests(TestCase):
+    def setUp(self):
+        self.config = AIAgentConfig.objects.create(
+            user=CustomUser.objects.create_user('joy@example.com', 'pw'), google_sheet_id='SHEET1',
+        )
+
+    def _sync(self, rows, columns=COLUMNS, digest=None):
+        snapshot = SheetSnapshot(self.config.google_sheet_id, columns, rows, digest or sha1(repr((columns, rows)).encode()).hexdigest())
+        with mock.patch('accounts.report_sync.report_cache.get_snapshot', return_value=snapshot):
+            return sync_report(self.config, force=True)
+
+    def _row_ids(self):
+        return dict(ReportRow.objects.filter(config=self.config).values_list('row_index', 'id'))
+
+    def test_new_rows_are_appended(self):
+        self._sync([('John', 'a', ''), ('Jane', 'b', '')])
+        before = self._row_ids()
+
+        sheet = self._sync([('John', 'a', ''), ('Jane', 'b', ''), ('Joy', 'c', '')])
+
+        after = self._row_ids()
+        self.assertEqual({i: after[i] for i in before}, before)
+        self.assertEqual(len(after), 3)
+        self.assertEqual((sheet.row_count, sheet.version), (3, 2))
+        self.assertEqual(ReportRow.objects.get(config=self.config, row_index=2).search_text, 'joy\nc\n')
+
+    def test_changed_synced_row_rebuilds(self):
+        self._sync([('John', 'a', ''), ('Jane', 'b', '')])
+        before = self._row_ids()
+
+        self._sync([('John', 'a', ''), ('Jane', 'edited', ''), ('Joy', 'c', '')])
+
+        after = self._row_ids()
+        self.assertEqual(len(after), 3)
+        self.assertFalse(set(before.values()) & set(after.values()))
+        self.assertEqual(ReportRow.objects.get(config=self.config, row_index=1).data, ['Jane', 'edited', ''])
+
+    def test_header_change_or_fewer_rows_rebuild(self):
+        self._sync([('John', 'a', ''), ('Jane', 'b', '')])
+        self._sync([('John', 'a', ''), ('Jane', 'b', '')], columns=['Name', 'Email', 'URL'])
+        self.assertEqual(ReportRow.objects.get(config=self.config, row_index=0).data, ['John', 'a', ''])
+
+        before = self._row_ids()
+        sheet = self._sync([('Jane', 'b', '')], columns=['Name', 'Email', 'URL'])
+        self.assertEqual(list(self._row_ids()), [0])
+        self.assertNotEqual(self._row_ids()[0], before[0])
+        self.assertEqual(sheet.row_count, 1)
+
+    def test_unchanged_digest_keeps_version(self):
+        self._sync([('John', 'a', '')], digest='same')
+        sheet = self._sync([('John', 'a', '')], digest='same')
+        self.assertEqual(sheet.version, 1)
+
+
+class ReportStoreTests(SimpleTestCase):
+    ROWS = [('John', 'john@gmail.com', ''), ('রহিম', 'কম দাম', 'https://example.org/'), ('', '', 'x')]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(REPORT_SNAPSHOT_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _save(self, digest='a' * 40):
+        return report_store.save(SheetSnapshot('SHEET1', COLUMNS, self.ROWS, digest))
+
+    def test_round_trip(self):
+        saved = self._save()
+        loaded = report_store.load('SHEET1')
+
+        for snapshot in (saved, loaded):
+            self.assertEqual((snapshot.sheet_id, snapshot.digest, snapshot.columns), ('SHEET1', 'a' * 40, COLUMNS))
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot.rows, self.ROWS)
+        self.assertEqual(loaded.read_rows(1, 2), [self.ROWS[1]])
+        self.assertEqual(loaded.read_rows(1, columns=[2, 0]), [('https://example.org/', 'রহিম'), ('x', '')])
+        self.assertEqual(loaded.read_rows(5, 9), [])
+
+    def test_load_by_digest_and_age(self):
+        self._save()
+        self.assertIsNotNone(report_store.load('SHEET1', digest='a' * 40))
+        self.assertIsNone(report_store.load('SHEET1', digest='b' * 40))
+        self.assertIsNone(report_store.load('SHEET2'))
+
+        path = report_store.load('SHEET1').path
+        os.utime(path, (0, 0))
+        self.assertIsNone(report_store.load('SHEET1', max_age=60))
+        report_store.touch(report_store.load('SHEET1'))
+        self.assertIsNotNone(report_store.load('SHEET1', max_age=60))
+
+    def test_incompatible_format_is_rebuilt(self):
+        export = b'Name,Email,Link\r\nJohn,a,\r\n'
+        with mock.patch.object(report_store, 'FORMAT_VERSION', report_store.FORMAT_VERSION + 1):
+            path = self._save(sha1(export).hexdigest()).path
+
+        # The next download finds the stale file under its digest, discards it and writes the export again
+        with mock.patch('accounts.report_cache.requests.get', return_value=mock.Mock(content=export)), \
+                self.assertLogs('accounts.report_store', 'WARNING'):
+            snapshot = fetch_snapshot('SHEET1')
+
+        self.assertEqual(snapshot.path, path)
+        self.assertEqual(report_store.load('SHEET1').rows, [('John', 'a', '')])
+
+    def test_cleanup_removes_other_versions_and_superseded_files(self):
+        older = self._save('a' * 40).path
+        newest = self._save('b' * 40).path
+        os.utime(older, (time.time() - 10, time.time() - 10))
+        open(os.path.join(self.directory, 'old-snapshot.v0.snap'), 'wb').close()
+
+        self.assertEqual(report_store.cleanup(), 2)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(newest)])
+
+
+def racing(claim):
+    """Patch QuerySet.update so that claim runs, as a second worker, just before the first claim's update."""
+    update = QuerySet.update
+    raced = []
+    results = []
+
+    def racing_update(queryset, **kwargs):
+        if not raced:
+            raced.append(True)
+            results.append(claim())
+        return update(queryset, **kwargs)
+
+    return mock.patch.object(QuerySet, 'update', racing_update), results
+
+
+class PostJobClaimTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('joy@example.com', 'pw')
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        first = PostJob.objects.create(user=self.user, message='first')
+        second = PostJob.objects.create(user=self.user, message='second')
+
+        self.assertEqual(claim_next_job(), first)
+        self.assertEqual(claim_next_job(), second)
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(PostJob.objects.get(pk=first.pk).status, 'RUNNING')
+
+    def test_two_workers_cannot_take_the_same_job(self):
+        job = PostJob.objects.create(user=self.user, message='hi')
+
+        patch, other = racing(claim_next_job)
+        with patch:
+            claimed = claim_next_job()
+
+        self.assertEqual(other, [job])
+        self.assertIsNone(claimed)
+        self.assertEqual(PostJob.objects.get(pk=job.pk).attempts, 1)
+
+    def test_deferred_job_waits_until_available(self):
+        job = PostJob.objects.create(
+            user=self.user, message='hi', available_at=timezone.now() + timezone.timedelta(minutes=1),
+        )
+        self.assertIsNone(claim_next_job())
+
+        PostJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        self.assertEqual(claim_next_job(), job)
+
+
+class ScheduledPostClaimTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('joy@example.com', 'pw')
+
+    def _post(self, minutes):
+        return ScheduledPost.objects.create(
+            user=self.user, message='hi', publish_at=timezone.now() + timezone.timedelta(minutes=minutes),
+        )
+
+    def test_only_due_posts_are_claimed(self):
+        later = self._post(-1)
+        earlier = self._post(-5)
+        self._post(5)
+
+        self.assertEqual(claim_due_posts(10), [earlier, later])
+        self.assertEqual(claim_due_posts(10), [])
+        self.assertEqual(ScheduledPost.objects.get(pk=earlier.pk).status, 'PUBLISHING')
+
+    def test_two_dispatchers_cannot_take_the_same_post(self):
+        post = self._post(-1)
+
+        patch, other = racing(lambda: claim_due_posts(10))
+        with patch:
+            claimed = claim_due_posts(10)
+
+        self.assertEqual(other, [[post]])
+        self.assertEqual(claimed, [])
+
+
+class PublishAtTests(SimpleTestCase):
+    def test_offset_sent_by_the_browser_is_used(self):
+        # Europe/Berlin, either side of the change to summer time on 29 March 2026
+        self.assertEqual(_parse_publish_at('2026-03-28T09:00:00.000Z').isoformat(), '2026-03-28T09:00:00+00:00')
+        self.assertEqual(_parse_publish_at('2026-03-30T10:00+02:00').isoformat(), '2026-03-30T08:00:00+00:00')
+
+    def test_value_without_offset_is_server_time(self):
+        self.assertEqual(_parse_publish_at('2026-03-30T10:00').isoformat(), '2026-03-30T10:00:00+00:00')
+
+    def test_malformed_value(self):
+        self.assertIsNone(_parse_publish_at('tomorrow'))
@@ -0,0 +1,120 @@
+"""
+Cached health of Facebook page tokens.
+
+Graph's debug_token tells whether a page token is valid, when it expires and
+which permissions it carries. The answer is stored per AIAgentConfig in
+PageTokenHealth, so views can refuse a known-bad token without making a
+Graph call first. It is refreshed in the background whenever
+facebook_page_api or facebook_page_id is saved (see signals.py), and
+periodically by the refresh_token_health command.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+import hashlib
+import logging
+
+from django.db import connection
+from django.utils import timezone
+import requests
+
+from . import graph
+from .models import AIAgentConfig, PageTokenHealth
+
+logger = logging.getLogger(__name__)
+
+INVALID_TOKEN_CODE = 190  # Graph's OAuthException code for a bad or expired token
+
+# Checks triggered by saves run here, after the response has been sent
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='token-health')
+
+
+def fingerprint(config):
+    """Identifies what a check covered: the token, and the page it must belong to."""
+    return hashlib.sha1(f'{config.facebook_page_id or ""}:{config.facebook_page_api}'.encode()).hexdigest()
+
+
+def check_token(config):
+    """
+    Ask debug_token about the config's page token and store the verdict.
+    Returns the PageTokenHealth, or None when Graph could not give an answer.
+    """
+    token = config.facebook_page_api
+    try:
+        response = graph.get(
+            'debug_token',
+            page_id=config.facebook_page_id or None,
+            params={'input_token': token, 'access_token': token},
+        )
+        payload = response.json()
+    except (requests.RequestException, ValueError) as e:
+        # Network trouble says nothing about the token; keep the last verdict
+        logger.warning('Token check for %s failed: %s', config.user.email, e)
+        return None
+
+    values = {
+        'token_fingerprint': fingerprint(config),
+        'checked_at': timezone.now(),
+        'expires_at': None,
+        'scopes': [],
+        'error': '',
+    }
+    data = payload.get('data') if response.status_code == 200 else None
+    if not isinstance(data, dict):
+        error = payload.get('error', {})
+        if error.get('code') != INVALID_TOKEN_CODE:
+            logger.warning('Token check for %s failed: %s', config.user.email, error.get('message'))
+            return None
+        values.update(is_valid=False, error=error.get('message', 'Invalid token'))
+    else:
+        values.update(
+            is_valid=bool(data.get('is_valid')),
+            scopes=data.get('scopes', []),
+            error=data.get('error', {}).get('message', ''),
+        )
+        if data.get('expires_at'):  # 0 means the token never expires
+            values['expires_at'] = datetime.fromtimestamp(data['expires_at'], tz=dt_timezone.utc)
+        page_id = config.facebook_page_id
+        if data.get('type') == 'PAGE' and page_id and data.get('profile_id') not in (None, page_id):
+            values.update(is_valid=False, error='This token belongs to a different Facebook Page.')
+
+    health, _ = PageTokenHealth.objects.update_or_create(config=config, defaults=values)
+    return health
+
+
+def get_health(config):
+    """The stored check of the config's current token and page, or None if they have not been checked."""
+    try:
+        health = config.token_health
+    except PageTokenHealth.DoesNotExist:
+        return None
+    if not config.facebook_page_api or health.token_fingerprint != fingerprint(config):
+        return None
+    return health
+
+
+def token_error(config):
+    """Why the page token cannot work according to the last check, or None if it may."""
+    health = get_health(config)
+    if health is None:
+        return None
+    if health.is_valid is False:
+        reason = health.error or 'rejected by Facebook'
+        return f'Your Facebook Page API key is not valid ({reason}). Please update it in AI Agent settings.'
+    if health.expires_at and health.expires_at <= timezone.now():
+        return 'Your Facebook Page API key has expired. Please update it in AI Agent settings.'
+    return None
+
+
+def revalidate_in_background(config_id):
+    _executor.submit(_revalidate, config_id)
+
+
+def _revalidate(config_id):
+    try:
+        config = AIAgentConfig.objects.select_related('user').filter(pk=config_id).first()
+        if config and config.facebook_page_api:
+            check_token(config)
+    except Exception:
+        logger.exception('Background token check for config %s failed', config_id)
+    finally:
+        connection.close()
@@ -1,7 +1,9 @@
 from django.urls import path
 from . import views
 from . import admin_views
-from .api_views import api_get_user_config
+from .api_views import (
+    api_get_user_config, api_get_user_configs, api_user_config_changes, api_user_blocked_post, api_user_blocked_posts,
+)
 
 urlpatterns = [
     # Custom Admin URLs
@@ -11,6 +13,8 @@ urlpatterns = [
     path('portal/admin/kyc/', admin_views.admin_kyc_list, name='admin_kyc_list'),
     path('portal/admin/kyc/action/', admin_views.admin_kyc_action, name='admin_kyc_action'),
     path('portal/admin/subscriptions/', admin_views.admin_subscription_list, name='admin_subscription_list'),
+    path('portal/admin/cache-stats/', admin_views.admin_cache_stats, name='admin_cache_stats'),
+    path('portal/admin/graph-usage/', admin_views.admin_graph_usage, name='admin_graph_usage'),
 
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
@@ -22,15 +26,24 @@ urlpatterns = [
     path('ai-agent/', views.ai_agent_view, name='ai_agent'),
 
     path('feed/', views.feed_view, name='feed'),
+    path('feed-data/', views.feed_data_api, name='feed_data_api'),
     path('create-post/', views.create_post_view, name='create_post'),
+    path('post-jobs/<int:job_id>/', views.post_job_status_api, name='post_job_status'),
+    path('scheduled-posts/<int:post_id>/cancel/', views.cancel_scheduled_post_view, name='cancel_scheduled_post'),
     path('report/', views.report_view, name='report'),
     path('report-data/', views.report_data_api, name='report_data_api'),
+    path('report-events/', views.report_events, name='report_events'),
     path('delete-comment/', views.delete_comment_view, name='delete_comment'),
+    path('delete-comments/', views.bulk_delete_comments_view, name='bulk_delete_comments'),
     path('kyc-required/', views.kyc_required_view, name='kyc_required'),
 
     
     # API endpoints
+    path('api/user/<str:admin_password>/<str:email_prefix>/changes/', api_user_config_changes, name='api_user_config_changes'),
+    path('api/user/<str:admin_password>/<str:email_prefix>/blocked/', api_user_blocked_posts, name='api_user_blocked_posts'),
+    path('api/user/<str:admin_password>/<str:email_prefix>/blocked/<str:post_id>/', api_user_blocked_post, name='api_user_blocked_post'),
     path('api/user/<str:admin_password>/<str:email_prefix>/<str:field>/', api_get_user_config, name='api_user_config'),
+    path('api/users/<str:admin_password>/configs/', api_get_user_configs, name='api_user_configs'),
     
     # Subscription
     path('subscription-expired/', views.subscription_expired, name='subscription_expired'),
@@ -1,14 +1,28 @@
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.contrib import messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserProfileForm, AIAgentConfigForm, KYCUploadForm
 
-from .models import CustomUser, UserProfile, AIAgentConfig
-import pandas as pd
-import io
-import requests
+from .models import CustomUser, UserProfile, AIAgentConfig, PostJob, ReportRow, ScheduledPost
+from . import graph, report_cache, report_export, report_search
+from .feed import FEED_PAGE_SIZE, invalidate_feed, load_feed, load_feed_page
+from .publishing import enqueue_post, schedule_post
+from .token_health import get_health, token_error
+from .report_sync import mark_viewed, sync_report
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from datetime import datetime, timezone as dt_timezone
+from django.utils import timezone
+import asyncio
+import hashlib
+import json
+import re
 
 
 
@@ -24,6 +38,8 @@ def report_view(request):
     if request.method == 'POST' and 'google_sheet_id' in request.POST:
         new_id = request.POST.get('google_sheet_id', '').strip()
         if new_id:
+            if new_id != ai_config.google_sheet_id:
+                report_cache.invalidate(ai_config.google_sheet_id)
             ai_config.google_sheet_id = new_id
             ai_config.save()
             messages.success(request, 'Report ID updated successfully!')
@@ -37,46 +53,23 @@ def report_view(request):
     page_obj = None
     
     if sheet_id:
-        url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-        
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            # Read into pandas DataFrame with UTF-8 encoding
-            # Use content (bytes) and BytesIO for better encoding handling
-            df = pd.read_csv(io.BytesIO(response.content), encoding='utf-8')
+            sheet = sync_report(ai_config)
+            mark_viewed(sheet)
+            rows = ReportRow.objects.filter(config=ai_config) # Most recent rows first
             
             # Filter logic if requested
             query = request.GET.get('q', '').strip()
+            columns = sheet.columns
             if query:
-                # Simple case-insensitive search across all columns
-                mask = df.astype(str).apply(lambda x: x.str.contains(query, case=False, na=False)).any(axis=1)
-                df = df[mask]
+                rows = report_search.search_rows(ai_config, columns, query)
                 
-
-            columns = df.columns.tolist()
-            df = df.iloc[::-1] # Reverse payload to show most recent at top
-            df = df.fillna('') # Replace NaN with empty string
-            
-            # Handle Excel Download
+            # Handle Excel/CSV/JSONL Download
             if request.GET.get('download') == 'true':
-                from django.http import HttpResponse
-                
-                # Create Excel file in memory
-                excel_buffer = io.BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Report')
-                
-                excel_buffer.seek(0)
-                response = HttpResponse(excel_buffer.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                response['Content-Disposition'] = 'attachment; filename="report.xlsx"'
-                return response
-            
-            data_list = df.values.tolist()
+                return report_export.export_response(rows, columns, request.GET.get('format', 'xlsx'))
             
             # Pagination
-            paginator = Paginator(data_list, 20) # Show 20 contacts per page
+            paginator = Paginator(rows.values_list('data', flat=True), 20) # Show 20 contacts per page
             page_number = request.GET.get('page')
             try:
                 page_obj = paginator.get_page(page_number)
@@ -112,46 +105,159 @@ def report_data_api(request):
         return JsonResponse({'error': 'No sheet ID configured'}, status=400)
 
     try:
-        url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-        response = requests.get(url)
-        response.raise_for_status()
-
-        df = pd.read_csv(io.BytesIO(response.content), encoding='utf-8')
+        sheet = sync_report(ai_config)
+        mark_viewed(sheet)
+        rows = ReportRow.objects.filter(config=ai_config)
 
+        columns = sheet.columns
         query = request.GET.get('q', '').strip()
+
+        # Conditional GET: the payload only changes with the synced sheet version
+        etag = quote_etag(hashlib.sha1(
+            f"{sheet.sheet_id}:{sheet.version}:{query}:{request.GET.get('page', 1)}".encode()
+        ).hexdigest())
+        last_modified = int(sheet.updated_at.timestamp()) if sheet.updated_at else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            not_modified['Cache-Control'] = 'private, no-cache'
+            return not_modified
+
         if query:
-            mask = df.astype(str).apply(lambda x: x.str.contains(query, case=False, na=False)).any(axis=1)
-            df = df[mask]
+            rows = report_search.search_rows(ai_config, columns, query)
 
-        columns = df.columns.tolist()
-        df = df.iloc[::-1]
-        df = df.fillna('')
-        data_list = df.values.tolist()
+        total_records = rows.count()
 
         # Pagination
         page_number = int(request.GET.get('page', 1))
         per_page = 20
-        total_pages = max(1, (len(data_list) + per_page - 1) // per_page)
-        page_number = min(page_number, total_pages)
+        total_pages = max(1, (total_records + per_page - 1) // per_page)
+        page_number = max(1, min(page_number, total_pages))
         start = (page_number - 1) * per_page
         end = start + per_page
-        page_data = data_list[start:end]
+        page_data = list(rows.values_list('data', flat=True)[start:end])
 
-        return JsonResponse({
+        response = JsonResponse({
             'columns': columns,
             'data': page_data,
             'page': page_number,
             'total_pages': total_pages,
-            'total_records': len(data_list),
+            'total_records': total_records,
             'has_previous': page_number > 1,
             'has_next': page_number < total_pages,
         })
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 
+def _sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _report_event_stream(ai_config, last_row_id):
+    """
+    Yield report rows appended after last_row_id, or a "changed" notice on rebuilds.
+    A "reset" tells the client to reload instead: when it reconnects after the
+    row it last saw is gone, or when more than REPORT_EVENTS_MAX_ROWS rows are new.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.REPORT_EVENTS_MAX_AGE
+    max_rows = settings.REPORT_EVENTS_MAX_ROWS
+    rows = ReportRow.objects.filter(config=ai_config)
+    seen_version = None
+    last_row_index = None
+    reset = False
+
+    if last_row_id:
+        # A reconnect carries on from the row the client saw last, if the sheet still has it
+        last_row_index = await rows.filter(id=last_row_id).values_list('row_index', flat=True).afirst()
+        reset = last_row_index is None
+    if not last_row_id or reset:
+        last = await rows.values_list('id', 'row_index').afirst()
+        last_row_id, last_row_index = last if last else (0, -1)
+
+    yield f'retry: {settings.REPORT_EVENTS_RETRY_MS}\n\n'
+    if reset:
+        yield _sse_event('reset', {}, last_row_id)
+
+    while loop.time() < deadline:
+        try:
+            sheet = await sync_to_async(sync_report)(ai_config)
+        except Exception:
+            sheet = None
+
+        if sheet is not None and sheet.version != seen_version:
+            new_rows = [
+                row async for row in rows.filter(id__gt=last_row_id)
+                .order_by('-id').values_list('id', 'row_index', 'data')[:max_rows + 1]
+            ]
+            first_check = seen_version is None
+            seen_version = sheet.version
+
+            if new_rows:
+                max_id = new_rows[0][0]
+                min_index = min(row_index for _, row_index, _ in new_rows)
+                if len(new_rows) > max_rows:
+                    # Too many to push; the client reloads the page it shows instead
+                    yield _sse_event('reset', {'version': sheet.version}, max_id)
+                elif min_index <= last_row_index:
+                    # The sheet was rebuilt rather than appended to
+                    yield _sse_event('changed', {'version': sheet.version}, max_id)
+                else:
+                    yield _sse_event('rows', {
+                        'columns': sheet.columns,
+                        'rows': [data for _, _, data in sorted(new_rows, key=lambda r: -r[1])],
+                        'total_records': sheet.row_count,
+                    }, max_id)
+                last_row_id = max_id
+                last_row_index = max(row_index for _, row_index, _ in new_rows)
+            elif not first_check:
+                yield _sse_event('changed', {'version': sheet.version}, last_row_id)
+            else:
+                yield ': ping\n\n'
+        else:
+            yield ': ping\n\n'
+
+        # Release the database connection between checks (unless DB_CONN_MAX_AGE keeps it)
+        await sync_to_async(close_old_connections)()
+        await asyncio.sleep(settings.REPORT_EVENTS_INTERVAL)
+
+
+@login_required
+async def report_events(request):
+    """Server-Sent Events stream pushing new report rows to the report page"""
+    user = await request.auser()
+    ai_config, _ = await AIAgentConfig.objects.aget_or_create(user=user)
+    if not ai_config.google_sheet_id or 'wsgi.version' in request.META:
+        # 204 tells EventSource not to reconnect. Under WSGI (runserver) the
+        # stream would be buffered whole and hold a thread for
+        # REPORT_EVENTS_MAX_AGE, so the page polls instead.
+        return HttpResponse(status=204)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_row_id = int(last_event_id) if last_event_id.isdigit() else None
+
+    response = StreamingHttpResponse(
+        _report_event_stream(ai_config, last_row_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+
 def register_view(request):
     """Handle user registration"""
     if request.user.is_authenticated:
@@ -264,7 +370,7 @@ def profile_view(request):
 def privacy_policy_view(request, email_prefix):
     """Public privacy policy page for a user based on their email prefix"""
     try:
-        user = CustomUser.objects.get(email__startswith=email_prefix + '@')
+        user = CustomUser.objects.get(email_prefix=email_prefix)
     except CustomUser.DoesNotExist:
         try:
             user = CustomUser.objects.get(email=email_prefix)
@@ -327,7 +433,9 @@ def ai_agent_view(request):
         'form': form,
         'webhook_url': webhook_url,
         'ai_config': ai_config,
-        'subscription_active': subscription_active
+        'subscription_active': subscription_active,
+        'token_health': get_health(ai_config),
+        'token_error': token_error(ai_config),
     })
 
 
@@ -336,6 +444,7 @@ def feed_view(request):
     """Display Facebook Page feed (posts) using the Graph API"""
     page_name = None
     posts = []
+    next_cursor = None
     error = None
 
     try:
@@ -346,29 +455,10 @@ def feed_view(request):
         if not page_id or not access_token:
             error = 'Facebook Page ID or API key is missing. Please configure your AI Agent first.'
         else:
-            # Fetch page name
-            try:
-                name_resp = requests.get(
-                    f"https://graph.facebook.com/v24.0/{page_id}",
-                    params={'fields': 'name', 'access_token': access_token}
-                )
-                if name_resp.status_code == 200:
-                    page_name = name_resp.json().get('name', 'Unknown Page')
-            except Exception:
-                page_name = 'Unknown Page'
-
-            # Fetch page feed
-            feed_resp = requests.get(
-                f"https://graph.facebook.com/v24.0/{page_id}/feed",
-                params={'access_token': access_token, 'fields': 'id,message,created_time,full_picture,permalink_url'}
-            )
-
-            if feed_resp.status_code == 200:
-                feed_data = feed_resp.json()
-                posts = feed_data.get('data', [])
-            else:
-                err_data = feed_resp.json()
-                error = err_data.get('error', {}).get('message', 'Failed to fetch feed.')
+            # A token already known to be bad fails here instead of at Graph
+            error = token_error(ai_config)
+            if not error:
+                page_name, posts, next_cursor, error = load_feed(page_id, access_token)
 
     except AIAgentConfig.DoesNotExist:
         error = 'AI Agent configuration not found. Please set it up first.'
@@ -378,13 +468,50 @@ def feed_view(request):
     return render(request, 'accounts/feed.html', {
         'page_name': page_name,
         'posts': posts,
+        'next_cursor': next_cursor,
         'error': error,
+        'pending_jobs': PostJob.objects.filter(user=request.user, status__in=['PENDING', 'RUNNING']),
+        'scheduled_posts': ScheduledPost.objects.filter(user=request.user, status='SCHEDULED'),
+    })
+
+
+@login_required
+def feed_data_api(request):
+    """JSON API endpoint returning the next page of feed posts for infinite scroll"""
+    after = request.GET.get('after', '').strip()
+    if not after:
+        return JsonResponse({'error': 'Missing after cursor'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', FEED_PAGE_SIZE))
+    except ValueError:
+        limit = FEED_PAGE_SIZE
+
+    ai_config = AIAgentConfig.objects.filter(user=request.user).first()
+    if not ai_config or not ai_config.facebook_page_id or not ai_config.facebook_page_api:
+        return JsonResponse({'error': 'Facebook Page ID or API key is missing.'}, status=400)
+    error = token_error(ai_config)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    try:
+        posts, next_cursor, error = load_feed_page(
+            ai_config.facebook_page_id, ai_config.facebook_page_api, after, limit
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=502)
+    if error:
+        return JsonResponse({'error': error}, status=502)
+
+    return JsonResponse({
+        'html': render_to_string('accounts/_feed_posts.html', {'posts': posts}, request=request),
+        'count': len(posts),
+        'next_cursor': next_cursor,
     })
 
 
 @login_required
 def create_post_view(request):
-    """Create a post on the user's Facebook Page using the Graph API"""
+    """Queue a post for the user's Facebook Page, now or at a scheduled time"""
     if request.method == 'POST':
         message = request.POST.get('message', '').strip()
         image = request.FILES.get('image')
@@ -393,6 +520,13 @@ def create_post_view(request):
             messages.error(request, 'Please provide a message or an image for the post.')
             return redirect('feed')
 
+        publish_at = None
+        if request.POST.get('publish_at'):
+            publish_at = _parse_publish_at(request.POST.get('publish_at_utc') or request.POST['publish_at'])
+            if publish_at is None or publish_at <= timezone.now():
+                messages.error(request, 'Please choose a valid time in the future for the scheduled post.')
+                return redirect('feed')
+
         try:
             ai_config = AIAgentConfig.objects.get(user=request.user)
             page_id = ai_config.facebook_page_id
@@ -402,26 +536,20 @@ def create_post_view(request):
                 messages.error(request, 'Facebook Page ID or API key is missing. Please configure your AI Agent first.')
                 return redirect('ai_agent')
 
-            if image:
-                # Photo post: POST /{page_id}/photos
-                url = f"https://graph.facebook.com/v24.0/{page_id}/photos"
-                files = {'source': (image.name, image.read(), image.content_type)}
-                data = {'access_token': access_token}
-                if message:
-                    data['caption'] = message
-                response = requests.post(url, data=data, files=files)
-            else:
-                # Text-only post: POST /{page_id}/feed
-                url = f"https://graph.facebook.com/v24.0/{page_id}/feed"
-                data = {'message': message, 'access_token': access_token}
-                response = requests.post(url, data=data)
+            error = token_error(ai_config)
+            if error:
+                messages.error(request, error)
+                return redirect('ai_agent')
 
-            if response.status_code == 200:
-                messages.success(request, 'Post published successfully!')
-            else:
-                err_data = response.json()
-                error_msg = err_data.get('error', {}).get('message', 'Unknown error')
-                messages.error(request, f'Failed to publish post: {error_msg}')
+            if publish_at:
+                schedule_post(request.user, message, publish_at, image)
+                messages.success(request, 'Post scheduled successfully!')
+                return redirect('feed')
+
+            job = enqueue_post(request.user, message, image)
+            if request.headers.get('Accept') == 'application/json':
+                return JsonResponse({'job_id': job.pk, 'status': job.status}, status=202)
+            messages.info(request, 'Your post is being published. It will appear in the feed shortly.')
 
         except AIAgentConfig.DoesNotExist:
             messages.error(request, 'AI Agent configuration not found.')
@@ -432,13 +560,61 @@ def create_post_view(request):
     return redirect('feed')
 
 
+def _parse_publish_at(value):
+    """
+    Turn the browser's ISO 8601 schedule time into an aware UTC datetime; None
+    when malformed. A value without an offset (no JavaScript) is taken as server time.
+    """
+    try:
+        publish_at = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timezone.is_naive(publish_at):
+        publish_at = timezone.make_aware(publish_at)
+    return publish_at.astimezone(dt_timezone.utc)
+
+
+@login_required
+def cancel_scheduled_post_view(request, post_id):
+    """Cancel a scheduled post that has not been published yet"""
+    if request.method == 'POST':
+        post = ScheduledPost.objects.filter(pk=post_id, user=request.user).first()
+        # Conditional update: the dispatcher may have claimed it a moment ago
+        if post and ScheduledPost.objects.filter(pk=post.pk, status='SCHEDULED').update(status='CANCELLED'):
+            if post.image:
+                post.image.delete(save=False)
+                ScheduledPost.objects.filter(pk=post.pk).update(image='')
+            messages.success(request, 'Scheduled post cancelled.')
+        else:
+            messages.error(request, 'This post can no longer be cancelled.')
+    return redirect('feed')
+
+
+@login_required
+def post_job_status_api(request, job_id):
+    """JSON API endpoint reporting the state of a queued post"""
+    job = PostJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        raise Http404
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'facebook_post_id': job.facebook_post_id,
+        'error': job.error,
+        'original_size': job.original_size,
+        'upload_size': job.upload_size,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+
+
 @login_required
 def delete_comment_view(request):
     """Delete a Facebook comment using the Graph API"""
     if request.method == 'POST':
         comment_id = request.POST.get('comment_id', '').strip()
         
-        if not comment_id:
+        if not COMMENT_ID_RE.match(comment_id):
             messages.error(request, 'Please provide a valid Comment ID.')
             return redirect('report')
             
@@ -450,12 +626,20 @@ def delete_comment_view(request):
             if not access_token:
                 messages.error(request, 'Facebook Page API token is missing. Please configure your AI agent first.')
                 return redirect('ai_agent')
+
+            error = token_error(ai_config)
+            if error:
+                messages.error(request, error)
+                return redirect('ai_agent')
             
             # Call Facebook Graph API
-            url = f"https://graph.facebook.com/v24.0/{comment_id}?access_token={access_token}"
-            response = requests.delete(url)
+            response = graph.delete(
+                comment_id, page_id=ai_config.facebook_page_id or None,
+                headers={'Authorization': f'OAuth {access_token}'},
+            )
             
             if response.status_code == 200:
+                invalidate_feed(ai_config.facebook_page_id)
                 messages.success(request, f'Comment {comment_id} deleted successfully!')
             else:
                 error_data = response.json()
@@ -471,6 +655,70 @@ def delete_comment_view(request):
     return redirect('report')
 
 
+MAX_BULK_DELETE = 500
+COMMENT_ID_RE = re.compile(r'^[\w-]+$')
+
+
+@login_required
+def bulk_delete_comments_view(request):
+    """Delete many Facebook comments through Graph batch requests, reporting each ID as JSON"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    if request.content_type == 'application/json':
+        try:
+            comment_ids = json.loads(request.body).get('comment_ids', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        comment_ids = re.split(r'[\s,]+', request.POST.get('comment_ids', ''))
+    if not isinstance(comment_ids, list):
+        return JsonResponse({'error': 'comment_ids must be a list'}, status=400)
+
+    # Unique, in the order given
+    comment_ids = list(dict.fromkeys(str(cid).strip() for cid in comment_ids if str(cid).strip()))
+    if not comment_ids:
+        return JsonResponse({'error': 'Please provide at least one Comment ID.'}, status=400)
+    if len(comment_ids) > MAX_BULK_DELETE:
+        return JsonResponse({'error': f'At most {MAX_BULK_DELETE} comments can be deleted at once.'}, status=400)
+
+    ai_config = AIAgentConfig.objects.filter(user=request.user).first()
+    if not ai_config or not ai_config.facebook_page_api:
+        return JsonResponse({'error': 'Facebook Page API token is missing. Please configure your AI agent first.'}, status=400)
+    error = token_error(ai_config)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    valid_ids = [cid for cid in comment_ids if COMMENT_ID_RE.match(cid)]
+    try:
+        outcomes = graph.batch(
+            [{'method': 'DELETE', 'relative_url': cid} for cid in valid_ids],
+            ai_config.facebook_page_api,
+            page_id=ai_config.facebook_page_id or None,
+        )
+    except graph.GraphError as e:
+        # Other batches may have gone through before this one failed
+        invalidate_feed(ai_config.facebook_page_id)
+        return JsonResponse({'error': f'Failed to delete comments: {e}'}, status=502)
+    by_id = dict(zip(valid_ids, outcomes))
+
+    results = []
+    for cid in comment_ids:
+        outcome = by_id.get(cid)
+        if outcome is None:
+            results.append({'id': cid, 'ok': False, 'error': 'Invalid Comment ID'})
+        elif outcome['status'] == 200:
+            results.append({'id': cid, 'ok': True})
+        else:
+            body = outcome['body'] if isinstance(outcome['body'], dict) else {}
+            results.append({'id': cid, 'ok': False, 'error': body.get('error', {}).get('message', 'Unknown error')})
+
+    deleted = sum(result['ok'] for result in results)
+    if deleted:
+        invalidate_feed(ai_config.facebook_page_id)
+    return JsonResponse({'deleted': deleted, 'failed': len(results) - deleted, 'results': results})
+
+
 @login_required
 def kyc_required_view(request):
     """Display KYC required page when user hasn't completed verification"""
@@ -503,8 +751,8 @@ def serve_protected_media(request, file_path):
         raise Http404
 
     # Check if this is a KYC document
-    if file_path.startswith('kyc_documents/'):
-        # KYC docs: only admin or superuser
+    if file_path.startswith(('kyc_documents/', 'post_uploads/')):
+        # KYC docs and queued post uploads: only admin or superuser
         if not request.user.is_authenticated:
             from django.contrib.auth.views import redirect_to_login
             return redirect_to_login(request.get_full_path())
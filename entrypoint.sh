@@ -3,15 +3,43 @@ set -e
 
 echo "==> Running database migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
 
 echo "==> Collecting static files..."
 python manage.py collectstatic --noinput
 
-echo "==> Starting Gunicorn..."
-exec gunicorn userpanel_project.wsgi:application \
+# Background workers run in this container because they read the uploads
+# spooled to its MEDIA_ROOT. Each one is restarted if it exits, so a crash
+# never leaves posts queued with nothing to publish them.
+supervise() {
+    while true; do
+        python manage.py "$@" && status=0 || status=$?
+        echo "==> Worker '$1' exited with status $status; restarting in 5s..."
+        sleep 5
+    done
+}
+
+echo "==> Starting post publishing worker..."
+supervise process_post_jobs --interval 2 &
+
+echo "==> Starting scheduled post dispatcher..."
+supervise dispatch_scheduled_posts --interval 30 &
+
+if [ -n "$REPORT_PREFETCH_INTERVAL" ]; then
+    echo "==> Starting report prefetcher (every ${REPORT_PREFETCH_INTERVAL}s)..."
+    supervise prefetch_reports --interval "$REPORT_PREFETCH_INTERVAL" &
+fi
+
+if [ -n "$TOKEN_HEALTH_INTERVAL" ]; then
+    echo "==> Starting page token checker (every ${TOKEN_HEALTH_INTERVAL}s)..."
+    supervise refresh_token_health --interval "$TOKEN_HEALTH_INTERVAL" &
+fi
+
+echo "==> Starting Gunicorn (ASGI)..."
+exec gunicorn userpanel_project.asgi:application \
+    --worker-class uvicorn_worker.UvicornWorker \
     --bind 0.0.0.0:${PORT:-8000} \
     --workers 2 \
-    --threads 2 \
     --timeout 120 \
     --access-logfile - \
     --error-logfile -
@@ -95,7 +95,10 @@ if _db_url:
     DATABASES = {
         'default': dj_database_url.config(
             default=_db_url,
-            conn_max_age=600,
+            # The site is served by ASGI workers, where sync code runs in
+            # per-request threads whose persistent connections are never
+            # reused or closed, so connections are closed after each request
+            conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', 0)),
             conn_health_checks=True,
         )
     }
@@ -194,3 +197,87 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER)
 # Site info (used in email templates)
 SITE_URL = os.getenv("SITE_URL", "https://pagepilot-fqji.onrender.com")
 SITE_NAME = os.getenv("SITE_NAME", "Page Pilot")
+
+# ─── Report Cache ───
+# Parsed Google Sheet snapshots shared by the report page and its polling API
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 30))  # seconds
+REPORT_FETCH_CONNECT_TIMEOUT = float(os.getenv("REPORT_FETCH_CONNECT_TIMEOUT", 3.05))  # seconds
+REPORT_FETCH_READ_TIMEOUT = float(os.getenv("REPORT_FETCH_READ_TIMEOUT", 20))  # seconds between received bytes
+REPORT_FETCH_WAIT_TIMEOUT = float(os.getenv("REPORT_FETCH_WAIT_TIMEOUT", 60))  # longest a request waits on another's download
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # per worker
+
+# Memory-mapped columnar copies of parsed sheets, shared by all workers on the host
+REPORT_SNAPSHOT_DIR = os.getenv("REPORT_SNAPSHOT_DIR", str(BASE_DIR / "report_snapshots"))
+REPORT_SNAPSHOT_MAX_AGE = int(os.getenv("REPORT_SNAPSHOT_MAX_AGE", 7 * 24 * 3600))  # seconds
+REPORT_SNAPSHOT_MAX_BYTES = int(os.getenv("REPORT_SNAPSHOT_MAX_BYTES", 512 * 1024 * 1024))  # on disk
+
+# Live report push (Server-Sent Events, needs the ASGI server)
+REPORT_EVENTS_INTERVAL = int(os.getenv("REPORT_EVENTS_INTERVAL", 10))  # seconds between sheet checks
+REPORT_EVENTS_MAX_AGE = int(os.getenv("REPORT_EVENTS_MAX_AGE", 300))  # seconds before the client reconnects
+REPORT_EVENTS_RETRY_MS = 5000
+REPORT_EVENTS_MAX_ROWS = int(os.getenv("REPORT_EVENTS_MAX_ROWS", 200))  # more new rows than this reset the client
+
+# ─── Facebook Graph API ───
+GRAPH_API_VERSION = os.getenv("GRAPH_API_VERSION", "v24.0")
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", 3.05))  # seconds
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", 20))  # seconds; photo uploads included
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", 2))  # idempotent calls only
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", 10))  # keep-alive connections per worker
+GRAPH_BATCH_CONCURRENCY = int(os.getenv("GRAPH_BATCH_CONCURRENCY", 3))  # batch requests in flight per call
+# Rate limits, from the X-App-Usage / X-Page-Usage headers (percent of the limit used)
+GRAPH_USAGE_THROTTLE = float(os.getenv("GRAPH_USAGE_THROTTLE", 75))  # start slowing calls down above this
+GRAPH_THROTTLE_MAX_DELAY = float(os.getenv("GRAPH_THROTTLE_MAX_DELAY", 2))  # seconds per call just below 100%
+GRAPH_THROTTLE_MAX_WAIT = float(os.getenv("GRAPH_THROTTLE_MAX_WAIT", 5))  # longer waits fail the call instead
+GRAPH_USAGE_TTL = int(os.getenv("GRAPH_USAGE_TTL", 300))  # seconds a usage report is trusted
+GRAPH_USAGE_MIRROR_INTERVAL = int(os.getenv("GRAPH_USAGE_MIRROR_INTERVAL", 60))  # seconds between unchanged usage writes to the cache
+
+# ─── Cache ───
+# "default" is shared by every worker and background process through a
+# database table (python manage.py createcachetable), so invalidating a feed
+# is seen everywhere at once. "snapshots" holds the config API's snapshots
+# and never costs a query: per-process memory, so other workers pick up a
+# rebuild within CONFIG_SNAPSHOT_TTL. Set CACHE_URL=redis://... (needs the
+# redis package) to put both in Redis, shared by all processes.
+CACHE_URL = os.getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        },
+        'snapshots': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'snapshots',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'pagepilot_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            },
+        },
+        'snapshots': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pagepilot-snapshots',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            },
+        },
+    }
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", 60))  # seconds
+# Config snapshots are rebuilt on save, but only in the saving process's
+# cache unless CACHE_URL is shared, so other workers catch up after the TTL
+CONFIG_SNAPSHOT_TTL = int(os.getenv("CONFIG_SNAPSHOT_TTL", 60))  # seconds
+CONFIG_SNAPSHOT_MISS_TTL = int(os.getenv("CONFIG_SNAPSHOT_MISS_TTL", 10))  # seconds for unknown prefixes
+CONFIG_CHANGES_POLL_INTERVAL = float(os.getenv("CONFIG_CHANGES_POLL_INTERVAL", 1))  # seconds between version checks
+CONFIG_CHANGES_MAX_WAIT = float(os.getenv("CONFIG_CHANGES_MAX_WAIT", 60))  # longest a long-poll request is held
+
+# ─── Post Publishing ───
+# Photos are resized and re-encoded before upload unless turned off
+POST_IMAGE_PROCESSING = os.getenv("POST_IMAGE_PROCESSING", "True") == "True"
+POST_IMAGE_MAX_DIMENSION = int(os.getenv("POST_IMAGE_MAX_DIMENSION", 2048))  # px, longest side
+POST_IMAGE_QUALITY = int(os.getenv("POST_IMAGE_QUALITY", 85))